@@ -0,0 +1,133 @@
+"""SM3 基准测试：吞吐量 (0 B ~ 64 MiB)、短消息单次延迟、批量模式吞吐，结果输出为 JSON"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import sm3 as sm3_module
+import sm3_batch
+from sm3 import sm3, SM3
+from sm3_batch import sm3_many
+
+THROUGHPUT_SIZES = [0, 64, 1 << 10, 64 << 10, 1 << 20, 16 << 20, 64 << 20]
+LATENCY_SIZES = [32, 64, 128]
+BATCH_SIZES = [32, 64]
+
+
+def _time(func, repeat: int, min_time: float) -> list:
+    """返回 repeat 次测量的单次调用耗时 (秒)；每次测量循环到至少 min_time"""
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - t0) / number)
+    return samples
+
+
+def bench_throughput(sizes, repeat, min_time):
+    results = []
+    for size in sizes:
+        data = os.urandom(size)
+        samples = _time(lambda: sm3(data), repeat, min_time)
+        best = min(samples)
+        results.append({
+            'size': size,
+            'seconds_per_call': best,
+            'mb_per_s': size / best / 1e6,
+        })
+    return results
+
+
+def bench_streaming(size, chunk_size, repeat, min_time):
+    data = os.urandom(size)
+
+    def run():
+        h = SM3()
+        for i in range(0, size, chunk_size):
+            h.update(data[i:i+chunk_size])
+        h.digest()
+
+    best = min(_time(run, repeat, min_time))
+    return {'size': size, 'chunk_size': chunk_size, 'mb_per_s': size / best / 1e6}
+
+
+def bench_latency(sizes, repeat, min_time):
+    results = []
+    for size in sizes:
+        data = os.urandom(size)
+        samples = _time(lambda: sm3(data), repeat, min_time)
+        results.append({
+            'size': size,
+            'median_us': statistics.median(samples) * 1e6,
+            'min_us': min(samples) * 1e6,
+        })
+    return results
+
+
+def bench_batch(sizes, count, repeat, min_time):
+    results = []
+    for size in sizes:
+        messages = [os.urandom(size) for _ in range(count)]
+        entry = {'size': size, 'count': count}
+        scalar = min(_time(lambda: [sm3(m) for m in messages], repeat, min_time))
+        entry['scalar_msgs_per_s'] = count / scalar
+        if sm3_batch.BACKEND == 'numpy':
+            batch = min(_time(lambda: sm3_many(messages), repeat, min_time))
+            entry['batch_msgs_per_s'] = count / batch
+            entry['batch_mb_per_s'] = count * size / batch / 1e6
+        results.append(entry)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--max-size', type=int, default=64 << 20,
+                        help='largest message size for the throughput sweep (bytes)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='minimum seconds per measurement')
+    parser.add_argument('--batch-count', type=int, default=10000)
+    parser.add_argument('--output', '-o', help='write JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    sizes = [s for s in THROUGHPUT_SIZES if s <= args.max_size]
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': sys.version.split()[0],
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'backend': sm3_module.BACKEND,
+            'numpy_batch': sm3_batch.BACKEND == 'numpy',
+            'repeat': args.repeat,
+            'min_time': args.min_time,
+        },
+        'throughput': bench_throughput(sizes, args.repeat, args.min_time),
+        'streaming': bench_streaming(min(args.max_size, 1 << 20), 4096, args.repeat, args.min_time),
+        'latency': bench_latency(LATENCY_SIZES, args.repeat, args.min_time),
+        'batch': bench_batch(BATCH_SIZES, args.batch_count, args.repeat, args.min_time),
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,109 +1,19 @@
 import struct
 import os
 
-def rotl(x, n):
-    return ((x << n) | (x >> (32 - n))) & 0xFFFFFFFF
+from sm3 import SM3, sm3
 
-def P0(x):
-    return x ^ rotl(x, 9) ^ rotl(x, 17)
 
-def P1(x):
-    return x ^ rotl(x, 15) ^ rotl(x, 23)
-
-def FF(a, b, c, j):
-    if j < 16:
-        return a ^ b ^ c
-    else:
-        return (a & b) | (a & c) | (b & c)
-
-def GG(e, f, g, j):
-    if j < 16:
-        return e ^ f ^ g
-    else:
-        return (e & f) | ((~e) & g)
-
-def sm3(message: bytes) -> bytes:
-    IV = [0x7380166F, 0x4914B2B9, 0x172442D7, 0xDA8A0600,
-          0xA96F30BC, 0x163138AA, 0xE38DEE4D, 0xB0FB0E4E]
-    T = [0x79CC4519] * 16 + [0x7A879D8A] * 48
-    
-    orig_len = len(message)
-    msg_len = orig_len * 8
-    message += b'\x80'
-    while (len(message) % 64) != 56:
-        message += b'\x00'
-    message += struct.pack('>Q', msg_len)
-    
-    registers = IV.copy()
-    for i in range(0, len(message), 64):
-        block = message[i:i+64]
-        W = list(struct.unpack('>16I', block)) + [0] * 52
-        
-        for j in range(16, 68):
-            W[j] = P1(W[j-16] ^ W[j-9] ^ rotl(W[j-3], 15)) ^ rotl(W[j-13], 7) ^ W[j-6]
-        W_prime = [W[j] ^ W[j+4] for j in range(64)]
-       
-        A, B, C, D, E, F, G, H = registers
-        for j in range(64):
-            SS1 = rotl((rotl(A, 12) + E + rotl(T[j], j)) & 0xFFFFFFFF, 7)
-            SS2 = SS1 ^ rotl(A, 12)
-            TT1 = (FF(A, B, C, j) + D + SS2 + W_prime[j]) & 0xFFFFFFFF
-            TT2 = (GG(E, F, G, j) + H + SS1 + W[j]) & 0xFFFFFFFF
-            D = C
-            C = rotl(B, 9)
-            B = A
-            A = TT1
-            H = G
-            G = rotl(F, 19)
-            F = E
-            E = P0(TT2)
-        
-        registers = [(r ^ s) & 0xFFFFFFFF for r, s in zip(registers, [A, B, C, D, E, F, G, H])]
-    
-    return b''.join(struct.pack('>I', r) for r in registers)
-
-def sm3_with_iv(message: bytes, iv: bytes) -> bytes:
-    registers = list(struct.unpack('>8I', iv))
-    
-    msg_len = len(message) * 8
-    padded = message + b'\x80'
-    while (len(padded) % 64) != 56:
-        padded += b'\x00'
-    padded += struct.pack('>Q', msg_len)
-    
-    for i in range(0, len(padded), 64):
-        block = padded[i:i+64]
-        W = list(struct.unpack('>16I', block)) + [0] * 52
-        
-        for j in range(16, 68):
-            W[j] = P1(W[j-16] ^ W[j-9] ^ rotl(W[j-3], 15)) ^ rotl(W[j-13], 7) ^ W[j-6]
-        W_prime = [W[j] ^ W[j+4] for j in range(64)]
-        
-
-        A, B, C, D, E, F, G, H = registers
-        for j in range(64):
-            SS1 = rotl((rotl(A, 12) + E + rotl(T[j], j)) & 0xFFFFFFFF, 7)
-            SS2 = SS1 ^ rotl(A, 12)
-            TT1 = (FF(A, B, C, j) + D + SS2 + W_prime[j]) & 0xFFFFFFFF
-            TT2 = (GG(E, F, G, j) + H + SS1 + W[j]) & 0xFFFFFFFF
-            D = C
-            C = rotl(B, 9)
-            B = A
-            A = TT1
-            H = G
-            G = rotl(F, 19)
-            F = E
-            E = P0(TT2)
-        
-
-        registers = [(r ^ s) & 0xFFFFFFFF for r, s in zip(registers, [A, B, C, D, E, F, G, H])]
-    
-    return b''.join(struct.pack('>I', r) for r in registers)
+def sm3_with_iv(message: bytes, iv: bytes, prefix_len: int = 0) -> bytes:
+    """以 iv 为中间状态继续哈希 message；prefix_len 为 iv 之前已吸收的字节数"""
+    h = SM3.from_state(iv, prefix_len)
+    h.update(message)
+    return h.digest()
 
 
 def generate_padding(secret_len: int) -> bytes:
     padding = b'\x80'
-    padding += b'\x00' * ((56 - (secret_len + 1) % 64) % 64
+    padding += b'\x00' * ((56 - (secret_len + 1) % 64) % 64)
     padding += struct.pack('>Q', secret_len * 8)
     return padding
 
@@ -123,8 +33,8 @@ def length_extension_attack(original_hash: bytes, secret_len: int, malicious: by
     # 生成原始消息的填充
     padding = generate_padding(secret_len)
     
-    # 使用原始哈希作为IV计算扩展哈希
-    new_hash = sm3_with_iv(padding + malicious, original_hash)
+    # 原始哈希即吸收 secret||padding 后的中间状态，从该状态继续吸收恶意消息
+    new_hash = sm3_with_iv(malicious, original_hash, secret_len + len(padding))
     
     return new_hash
 
@@ -161,9 +71,6 @@ def verify_attack():
         print(f"   真实哈希: {real_hash.hex()}")
 
 if __name__ == "__main__":
-   
-    global T
-    T = [0x79CC4519] * 16 + [0x7A879D8A] * 48
     
     print("SM3 长度扩展攻击演示")
     print("=" * 50)
@@ -1,98 +1,259 @@
-import struct
 import os
-import math
+import mmap
+import struct
+import time
 from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
 
-def sm3(message: bytes) -> bytes:
-    IV = [0x7380166F, 0x4914B2B9, 0x172442D7, 0xDA8A0600,
-          0xA96F30BC, 0x163138AA, 0xE38DEE4D, 0xB0FB0E4E]
-    T = [0x79CC4519] * 16 + [0x7A879D8A] * 48
-    
-    orig_len = len(message)
-    msg_len = orig_len * 8
-    message += b'\x80'
-    while (len(message) % 64) != 56:
-        message += b'\x00'
-    message += struct.pack('>Q', msg_len)
-    
-    registers = IV.copy()
-    for i in range(0, len(message), 64):
-        block = message[i:i+64]
-        W = list(struct.unpack('>16I', block)) + [0] * 52
-        
-        for j in range(16, 68):
-            w16 = W[j-16]
-            w9 = W[j-9]
-            w3 = rotl(W[j-3], 15)
-            w13 = rotl(W[j-13], 7)
-            W[j] = P1(w16 ^ w9 ^ w3) ^ w13 ^ W[j-6]
-        W_prime = [W[j] ^ W[j+4] for j in range(64)]
-        
-        A, B, C, D, E, F, G, H = registers
-        for j in range(64):
-            SS1 = rotl((rotl(A, 12) + E + rotl(T[j], j)) & 0xFFFFFFFF, 7)
-            SS2 = SS1 ^ rotl(A, 12)
-            TT1 = (FF(A, B, C, j) + D + SS2 + W_prime[j]) & 0xFFFFFFFF
-            TT2 = (GG(E, F, G, j) + H + SS1 + W[j]) & 0xFFFFFFFF
-            D = C
-            C = rotl(B, 9)
-            B = A
-            A = TT1
-            H = G
-            G = rotl(F, 19)
-            F = E
-            E = P0(TT2)
-        
-        registers = [(r ^ s) & 0xFFFFFFFF for r, s in zip(registers, [A, B, C, D, E, F, G, H])]
-    
-    return b''.join(struct.pack('>I', r) for r in registers)
+from sm3 import sm3
+from sm3_batch import sm3_many, sm3_node_level
+from sm3_parallel import sm3_parallel
+
+HASH_SIZE = 32
+# 文件格式: magic(8) || 叶子数(8, 大端) || 标志(8) || 各层摘要自底向上连续存放
+_FILE_MAGIC = b'SM3MKT01'
+_HEADER = struct.Struct('>8sQQ')
+_FLAG_SORTED = 1
+
+
+def _level_sizes(leaf_count: int) -> list:
+    sizes = [leaf_count]
+    while sizes[-1] > 1:
+        sizes.append((sizes[-1] + 1) // 2)
+    return sizes
+
+
+def _build_subtree_levels(leaf_buf: bytes, height: int) -> list:
+    """工作进程：由一段对齐的叶子摘要向上构建 height 层，返回各层的连续摘要"""
+    levels = []
+    current = leaf_buf
+    for _ in range(height):
+        current = sm3_node_level(current)
+        levels.append(current)
+    return levels
+
+
+class DigestArray:
+    """连续存放的 32 字节摘要数组，按下标取出单个摘要。
+
+    底层缓冲区可以是 bytearray (可追加/改写)，也可以是只读的 bytes / mmap；
+    offset 为第一个摘要在缓冲区中的字节偏移。
+    """
+
+    def __init__(self, buf=None, count: int = None, offset: int = 0):
+        self._buf = bytearray() if buf is None else buf
+        self._offset = offset
+        self._count = (len(self._buf) - offset) // HASH_SIZE if count is None else count
 
-def rotl(x, n):
-    return ((x << n) | (x >> (32 - n))) & 0xFFFFFFFF
+    def __len__(self):
+        return self._count
 
-def P0(x):
-    return x ^ rotl(x, 9) ^ rotl(x, 17)
+    def __getitem__(self, index: int) -> bytes:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("digest index out of range")
+        off = self._offset + index * HASH_SIZE
+        return bytes(self._buf[off:off + HASH_SIZE])
 
-def P1(x):
-    return x ^ rotl(x, 15) ^ rotl(x, 23)
+    def __setitem__(self, index: int, digest: bytes) -> None:
+        if not 0 <= index < self._count:
+            raise IndexError("digest index out of range")
+        off = self._offset + index * HASH_SIZE
+        self._buf[off:off + HASH_SIZE] = digest
 
-def FF(a, b, c, j):
-    if j < 16:
-        return a ^ b ^ c
-    else:
-        return (a & b) | (a & c) | (b & c)
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def append(self, digest: bytes) -> None:
+        self._buf += digest
+        self._count += 1
+
+    def buffer(self) -> memoryview:
+        """全部摘要的零拷贝视图 (用完即释放，bytearray 存在视图时不能追加)"""
+        return memoryview(self._buf)[self._offset:self._offset + self._count * HASH_SIZE]
 
-def GG(e, f, g, j):
-    if j < 16:
-        return e ^ f ^ g
-    else:
-        return (e & f) | ((~e) & g)
 
 class MerkleTree:
-    def __init__(self, data_list: list):
+    # 叶子数低于该值时并行建树的进程开销大于收益
+    PARALLEL_MIN_LEAVES = 1 << 14
+    
+    def __init__(self, data_list: list, sorted_leaves: bool = False, workers: int = 1,
+                 instrument: bool = False, on_phase=None):
+        """sorted_leaves=True 时按叶子摘要升序排列叶子，叶子层本身即有序索引，
+        支持 O(log n) 的不存在性证明 (get_exclusion_proof)。
+        workers != 1 时叶子哈希与下层子树在多进程中并行构建 (None 表示 CPU 核数)。
+        instrument=True 或给出 on_phase(phase, record) 回调时，按阶段记录耗时、
+        SM3 调用次数与哈希字节数，累计结果见 self.stats"""
+        self._init_instrumentation(instrument, on_phase)
         self.leaf_count = len(data_list)
-        self.leaves = [sm3(b'\x00' + data) for data in data_list]
+        self.sorted_leaves = sorted_leaves
+        
+        start = time.perf_counter()
+        messages = [b'\x00' + data for data in data_list]
+        if workers != 1 and self.leaf_count >= self.PARALLEL_MIN_LEAVES:
+            digests = sm3_parallel(messages, workers=workers, batch_size=1 << 13)
+        else:
+            digests = sm3_many(messages)
+        if sorted_leaves:
+            digests.sort()
+        self.leaves = DigestArray(bytearray().join(digests))
+        if self.instrument:
+            self._record('leaf_hash', start, len(messages), sum(map(len, messages)))
         self.tree = []
-        self.build_tree()
+        self.build_tree(workers)
+    
+    def _init_instrumentation(self, instrument: bool = False, on_phase=None):
+        self.instrument = instrument or on_phase is not None
+        self.on_phase = on_phase
+        self.stats = {}
+    
+    def _record(self, phase: str, start: float, sm3_calls: int = 0, bytes_hashed: int = 0):
+        """累计一个阶段的统计并通知回调；start 为 time.perf_counter() 起点"""
+        seconds = time.perf_counter() - start
+        entry = self.stats.setdefault(phase, {'count': 0, 'seconds': 0.0, 'sm3_calls': 0, 'bytes_hashed': 0})
+        entry['count'] += 1
+        entry['seconds'] += seconds
+        entry['sm3_calls'] += sm3_calls
+        entry['bytes_hashed'] += bytes_hashed
+        if self.on_phase is not None:
+            self.on_phase(phase, {'seconds': seconds, 'sm3_calls': sm3_calls, 'bytes_hashed': bytes_hashed})
+    
+    def reset_stats(self) -> None:
+        self.stats = {}
     
-    def build_tree(self):
-        current_level = self.leaves.copy()
-        self.tree.append(current_level)
+    def build_tree(self, workers: int = 1):
+        start = time.perf_counter()
+        current_level = self.leaves
+        self.tree = [current_level]
+        if workers != 1 and self.leaf_count >= self.PARALLEL_MIN_LEAVES:
+            self.tree.extend(self._build_lower_levels_parallel(workers))
+            current_level = self.tree[-1]
         
         while len(current_level) > 1:
-            next_level = []
-            for i in range(0, len(current_level), 2):
-                left = current_level[i]
-                right = current_level[i+1] if i+1 < len(current_level) else left
-                parent = sm3(b'\x01' + left + right)
-                next_level.append(parent)
+            with current_level.buffer() as view:
+                next_level = DigestArray(sm3_node_level(view))
             self.tree.append(next_level)
             current_level = next_level
+        
+        if self.instrument:
+            parents = sum(len(level) for level in self.tree[1:])
+            self._record('build_levels', start, parents, parents * (1 + 2 * HASH_SIZE))
+    
+    def _build_lower_levels_parallel(self, workers) -> list:
+        """把叶子层切成 2^h 对齐的块，各进程独立构建块内 h 层子树后按层拼接。
+        块边界对齐保证块内结点与整树结点一一对应；最后一块不满时其末结点自配对，
+        与整树的奇数结点复制规则一致"""
+        chunks_wanted = (workers or os.cpu_count() or 1) * 4
+        height = max(1, (self.leaf_count // chunks_wanted).bit_length() - 1)
+        chunk_bytes = (1 << height) * HASH_SIZE
+        with self.leaves.buffer() as view:
+            chunks = [bytes(view[off:off + chunk_bytes]) for off in range(0, len(view), chunk_bytes)]
+        
+        levels = [bytearray() for _ in range(height)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for subtree in pool.map(_build_subtree_levels, chunks, [height] * len(chunks)):
+                for level, nodes in zip(levels, subtree):
+                    level += nodes
+        return [DigestArray(level) for level in levels]
     
     def root(self) -> bytes:
         return self.tree[-1][0]
     
+    def append(self, data: bytes) -> None:
+        """追加一个叶子 (CT 日志式)：只沿新叶子的右边缘路径重算 O(log n) 个父结点，
+        其余子树不动，之后 root() 与 get_inclusion_proof() 立即反映新叶子"""
+        if getattr(self, '_mmap', None) is not None:
+            raise ValueError("tree loaded from file is read-only")
+        start = time.perf_counter()
+        leaf = sm3(b'\x00' + data)
+        if self.sorted_leaves and self.leaf_count and leaf < self.leaves[-1]:
+            raise ValueError("appended leaf would break the sorted leaf order")
+        self.leaves.append(leaf)
+        self.leaf_count += 1
+        
+        index = self.leaf_count - 1
+        level = 0
+        while len(self.tree[level]) > 1:
+            nodes = self.tree[level]
+            left_index = index - index % 2
+            left = nodes[left_index]
+            right = nodes[left_index + 1] if left_index + 1 < len(nodes) else left
+            parent = sm3(b'\x01' + left + right)
+            
+            index //= 2
+            level += 1
+            if level == len(self.tree):
+                self.tree.append(DigestArray())
+            upper = self.tree[level]
+            if index < len(upper):
+                upper[index] = parent
+            else:
+                upper.append(parent)
+        
+        if self.instrument:
+            self._record('append', start, 1 + level, 1 + len(data) + level * (1 + 2 * HASH_SIZE))
+    
+    def save(self, path) -> None:
+        """把整棵树写成一个文件：每层是连续的 32 字节摘要数组，可被 load() 直接映射"""
+        with open(path, 'wb') as f:
+            flags = _FLAG_SORTED if self.sorted_leaves else 0
+            f.write(_HEADER.pack(_FILE_MAGIC, self.leaf_count, flags))
+            for level in self.tree:
+                with level.buffer() as view:
+                    f.write(view)
+    
+    @classmethod
+    def load(cls, path) -> 'MerkleTree':
+        """内存映射 save() 写出的文件；证明生成直接按下标读取映射区，不重建任何层"""
+        with open(path, 'rb') as f:
+            # 空文件无法映射，过短的文件也无法读出文件头，统一按格式错误处理
+            if os.fstat(f.fileno()).st_size < _HEADER.size:
+                raise ValueError("not a Merkle tree file")
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, leaf_count, flags = _HEADER.unpack_from(mm, 0)
+            if magic != _FILE_MAGIC:
+                raise ValueError("not a Merkle tree file")
+            sizes = _level_sizes(leaf_count)
+            if len(mm) != _HEADER.size + sum(sizes) * HASH_SIZE:
+                raise ValueError("not a Merkle tree file")
+            
+            tree = cls.__new__(cls)
+            tree._init_instrumentation()
+            tree.leaf_count = leaf_count
+            tree.sorted_leaves = bool(flags & _FLAG_SORTED)
+            tree.tree = []
+            offset = _HEADER.size
+            for size in sizes:
+                tree.tree.append(DigestArray(mm, size, offset))
+                offset += size * HASH_SIZE
+            tree.leaves = tree.tree[0]
+        except BaseException:
+            mm.close()
+            raise
+        tree._mmap = mm
+        return tree
+    
+    def close(self) -> None:
+        """释放 load() 建立的内存映射"""
+        mm = getattr(self, '_mmap', None)
+        if mm is None:
+            return
+        self.tree = []
+        self.leaves = None
+        mm.close()
+        self._mmap = None
+    
     def get_inclusion_proof(self, index: int) -> list:
+        start = time.perf_counter()
+        proof = self._inclusion_path(index)
+        if self.instrument:
+            self._record('inclusion_proof', start)
+        return proof
+    
+    def _inclusion_path(self, index: int) -> list:
         if index < 0 or index >= self.leaf_count:
             raise ValueError("Invalid leaf index")
         
@@ -113,76 +274,381 @@ class MerkleTree:
         
         return proof
     
-    def verify_inclusion(self, data: bytes, index: int, proof: list) -> bool:
-        current_hash = sm3(b'\x00' + data)
+    def get_multiproof(self, indices) -> list:
+        """多个叶子的合并证明：自底向上逐层只给出无法由已知结点推出的兄弟，
+        共享的上层兄弟只出现一次；按层、层内按下标顺序排列"""
+        start = time.perf_counter()
+        known = sorted(set(indices))
+        if known and (known[0] < 0 or known[-1] >= self.leaf_count):
+            raise ValueError("Invalid leaf index")
         
-        current_index = index
-        for sibling_hash in proof:
-            if current_index % 2 == 1:
-                current_hash = sm3(b'\x01' + sibling_hash + current_hash)
-            else:
-                current_hash = sm3(b'\x01' + current_hash + sibling_hash)
-            current_index //= 2
+        proof = []
+        for level in range(0, len(self.tree) - 1):
+            level_nodes = self.tree[level]
+            parents = []
+            i = 0
+            while i < len(known):
+                index = known[i]
+                sibling_index = index ^ 1
+                if index % 2 == 0 and i + 1 < len(known) and known[i + 1] == sibling_index:
+                    i += 2
+                else:
+                    # 奇数层末结点与自身配对，无需兄弟
+                    if sibling_index < len(level_nodes):
+                        proof.append(level_nodes[sibling_index])
+                    i += 1
+                parents.append(index // 2)
+            known = parents
         
-        return current_hash == self.root()
+        if self.instrument:
+            self._record('multiproof', start)
+        return proof
     
-    def get_exclusion_proof(self, data: bytes) -> tuple:
+    def verify_multiproof(self, indices, data_list, proof: list) -> bool:
+        """data_list[i] 为叶子 indices[i] 的数据；共享祖先只计算一次"""
+        if len(indices) != len(data_list):
+            return False
+        return verify_multi_inclusion_proof(self.root(), self.leaf_count, indices, data_list, proof)
+    
+    def verify_inclusion(self, data: bytes, index: int, proof: list) -> bool:
+        return verify_inclusion_proof(self.root(), data, index, self.leaf_count, proof)
+    
+    def find_leaf(self, data: bytes):
+        """有序树中二分查找 data 对应叶子的下标，不存在时返回 None"""
+        self._require_sorted()
         target_hash = sm3(b'\x00' + data)
-        
-        leaf_hashes = [leaf.hex() for leaf in self.leaves]
-        target_hex = target_hash.hex()
-        
-        pos = bisect_left(leaf_hashes, target_hex)
-        
-        left_index = pos - 1 if pos > 0 else None
-        right_index = pos if pos < self.leaf_count else None
-        
-        left_proof = self.get_inclusion_proof(left_index) if left_index is not None else []
-        right_proof = self.get_inclusion_proof(right_index) if right_index is not None else []
-        
-        return (pos, left_proof, right_proof)
+        pos = bisect_left(self.leaves, target_hash)
+        if pos < self.leaf_count and self.leaves[pos] == target_hash:
+            return pos
+        return None
+    
+    def _require_sorted(self):
+        if not self.sorted_leaves:
+            raise ValueError("exclusion proofs need a tree built with sorted_leaves=True")
     
-    def verify_exclusion(self, data: bytes, pos: int, 
-                         left_proof: list, right_proof: list) -> bool:
+    def get_exclusion_proof(self, data: bytes) -> tuple:
+        """返回 (pos, left_hash, left_proof, right_hash, right_proof)：pos 为 data 的插入位置，
+        left/right 为相邻叶子 pos-1 与 pos 的摘要及其存在性证明 (不存在的一侧为 None 与 [])，
+        可交给 verify_exclusion_proof() 在不持有整棵树的情况下验证"""
+        self._require_sorted()
+        start = time.perf_counter()
         target_hash = sm3(b'\x00' + data)
-        target_hex = target_hash.hex()
-        leaf_hashes = [leaf.hex() for leaf in self.leaves]
         
-        if pos < 0 or pos > self.leaf_count:
-            return False
+        pos = bisect_left(self.leaves, target_hash)
+        if pos < self.leaf_count and self.leaves[pos] == target_hash:
+            raise ValueError("data is present in the tree")
         
+        left_hash, left_proof = None, []
         if pos > 0:
-            left_index = pos - 1
-            left_data = b"left_neighbor"
-            if not self.verify_inclusion(left_data, left_index, left_proof):
-                return False
-            
-            if leaf_hashes[left_index] >= target_hex:
-                return False
-        
+            left_hash, left_proof = self.leaves[pos - 1], self._inclusion_path(pos - 1)
+        right_hash, right_proof = None, []
         if pos < self.leaf_count:
-            right_index = pos
-            right_data = b"right_neighbor"
-            if not self.verify_inclusion(right_data, right_index, right_proof):
-                return False
-            
-            if leaf_hashes[right_index] <= target_hex:
-                return False
+            right_hash, right_proof = self.leaves[pos], self._inclusion_path(pos)
         
-        return True
+        if self.instrument:
+            self._record('exclusion_proof', start, 1, 1 + len(data))
+        return (pos, left_hash, left_proof, right_hash, right_proof)
+    
+    def verify_exclusion(self, data: bytes, proof: tuple) -> bool:
+        self._require_sorted()
+        return verify_exclusion_proof(self.root(), self.leaf_count, data, proof)
+
+_RECORD_BATCH = 4096  # MerkleRootBuilder.update 每次批量求叶子摘要的记录数，限制原始记录的内存
+
+
+class MerkleRootBuilder:
+    """流式计算 Merkle 根：只保留 O(log n) 个尚未配对的满子树根，
+    结果与 MerkleTree(...).root() 相同 (含奇数结点自配对规则)"""
+    
+    def __init__(self):
+        self.leaf_count = 0
+        self._stack = []  # (高度, 子树根)，高度自底向顶严格递减
+    
+    def _push(self, height: int, node: bytes) -> None:
+        """压入一棵高度为 height 的满子树根，与栈顶等高的子树逐级合并；
+        调用方保证此前的叶子数是 2^height 的倍数，栈中高度保持严格递减"""
+        stack = self._stack
+        while stack and stack[-1][0] == height:
+            node = sm3(b'\x01' + stack.pop()[1] + node)
+            height += 1
+        stack.append((height, node))
+    
+    def add_leaf_hash(self, leaf_hash: bytes) -> None:
+        self._push(0, leaf_hash)
+        self.leaf_count += 1
+    
+    def add_leaf_hashes(self, leaf_hashes: list) -> None:
+        """批量加入叶子摘要：按当前叶子数的对齐情况切成尽可能大的 2^j 块，
+        每块用 sm3_node_level 整层归约成一棵满子树的根后入栈，逐个计算的合并只剩 O(log n) 次"""
+        start = 0
+        while start < len(leaf_hashes):
+            size = 1 << ((len(leaf_hashes) - start).bit_length() - 1)
+            while self.leaf_count % size:
+                size >>= 1
+            level = bytearray().join(leaf_hashes[start:start + size])
+            for _ in range(size.bit_length() - 1):
+                level = sm3_node_level(level)
+            self._push(size.bit_length() - 1, bytes(level))
+            self.leaf_count += size
+            start += size
+    
+    def add(self, data: bytes) -> None:
+        self.add_leaf_hash(sm3(b'\x00' + data))
+    
+    def update(self, records, batch_size: int = 1 << 16) -> None:
+        """消费任意可迭代的叶子数据。记录每 _RECORD_BATCH 条批量求叶子摘要；
+        batch_size 须为 2 的幂 2^k，每攒满 batch_size 个叶子摘要就整层归约成一棵高度 k 的满子树入栈，
+        末尾不满的一批按二进制分解成若干更小的满子树。
+        内存约为 batch_size * 32 字节的摘要加上 _RECORD_BATCH 条记录"""
+        if batch_size < 1 or batch_size & (batch_size - 1):
+            raise ValueError("batch_size must be a power of two")
+        digests = []
+        batch = []
+        for data in records:
+            batch.append(b'\x00' + data)
+            if len(batch) == _RECORD_BATCH:
+                digests += sm3_many(batch)
+                batch = []
+                while len(digests) >= batch_size:
+                    self.add_leaf_hashes(digests[:batch_size])
+                    del digests[:batch_size]
+        digests += sm3_many(batch)
+        self.add_leaf_hashes(digests)
+    
+    def root(self) -> bytes:
+        if not self._stack:
+            raise ValueError("no leaves added")
+        # 最低的未配对子树不断与自身配对升高，直到与下一个满子树等高后作为其右孩子
+        height, node = self._stack[-1]
+        for left_height, left in reversed(self._stack[:-1]):
+            while height < left_height:
+                node = sm3(b'\x01' + node + node)
+                height += 1
+            node = sm3(b'\x01' + left + node)
+            height += 1
+        return node
+
+
+def merkle_root(records) -> bytes:
+    builder = MerkleRootBuilder()
+    builder.update(records)
+    return builder.root()
+
+
+def merkle_root_file(path, record_size: int = None) -> bytes:
+    """文件流式求根：record_size 给定时按定长记录切分，否则按行 (去掉行尾 \\n)"""
+    with open(path, 'rb') as f:
+        if record_size:
+            records = iter(lambda: f.read(record_size), b'')
+        else:
+            records = (line[:-1] if line.endswith(b'\n') else line for line in f)
+        return merkle_root(records)
+
+
+# 以下验证函数只需根、树规模与证明，不依赖任何树状态，供轻客户端使用；
+# 证明来自不可信方，格式不符时一律返回 False 而不抛出异常
+
+def _is_digest(value) -> bool:
+    return isinstance(value, (bytes, bytearray)) and len(value) == HASH_SIZE
+
+
+def verify_leaf_hash_proof(root: bytes, leaf_hash: bytes, index: int, tree_size: int, proof: list) -> bool:
+    """proof 为 get_inclusion_proof() 的结果或 decode_proof() 的结果；
+    奇数层末结点处与自身配对，该位置的证明项被忽略 (可为 None)；其余证明项须为 32 字节摘要"""
+    sizes = _level_sizes(tree_size)
+    if not 0 <= index < tree_size or not _is_digest(leaf_hash):
+        return False
+    if not isinstance(proof, (list, tuple)) or len(proof) != len(sizes) - 1:
+        return False
+    current_hash = leaf_hash
+    for size, sibling_hash in zip(sizes, proof):
+        if index ^ 1 < size and not _is_digest(sibling_hash):
+            return False
+        if index % 2 == 1:
+            current_hash = sm3(b'\x01' + sibling_hash + current_hash)
+        elif index + 1 < size:
+            current_hash = sm3(b'\x01' + current_hash + sibling_hash)
+        else:
+            current_hash = sm3(b'\x01' + current_hash + current_hash)
+        index //= 2
+    return current_hash == root
+
+
+def verify_inclusion_proof(root: bytes, data: bytes, index: int, tree_size: int, proof: list) -> bool:
+    return verify_leaf_hash_proof(root, sm3(b'\x00' + data), index, tree_size, proof)
+
+
+def verify_multi_inclusion_proof(root: bytes, tree_size: int, indices, data_list, proof: list) -> bool:
+    """验证 get_multiproof() 生成的合并证明，data_list[i] 为叶子 indices[i] 的数据"""
+    if len(indices) != len(data_list):
+        return False
+    try:
+        computed = _multiproof_root(tree_size, indices,
+                                    sm3_many([b'\x00' + data for data in data_list]), proof)
+    except ValueError:
+        return False
+    return computed == root
+
+
+def verify_exclusion_proof(root: bytes, tree_size: int, data: bytes, proof: tuple) -> bool:
+    """验证有序树 (sorted_leaves=True) 的不存在性证明：相邻叶子 pos-1 与 pos 都在树中，
+    且 data 的叶子摘要严格位于两者之间 (pos 为 0 或 tree_size 时只有一侧)"""
+    if not isinstance(proof, (list, tuple)) or len(proof) != 5:
+        return False
+    pos, left_hash, left_proof, right_hash, right_proof = proof
+    if not isinstance(pos, int) or not 0 <= pos <= tree_size or tree_size == 0:
+        return False
+    target_hash = sm3(b'\x00' + data)
+    if pos > 0:
+        if not _is_digest(left_hash) or left_hash >= target_hash:
+            return False
+        if not verify_leaf_hash_proof(root, left_hash, pos - 1, tree_size, left_proof):
+            return False
+    if pos < tree_size:
+        if not _is_digest(right_hash) or right_hash <= target_hash:
+            return False
+        if not verify_leaf_hash_proof(root, right_hash, pos, tree_size, right_proof):
+            return False
+    return True
+
+
+# 紧凑二进制证明: 下标(8) || 树规模(8) || 需要的兄弟摘要 (自配对位置省略)
+_PROOF_HEADER = struct.Struct('>QQ')
+
+
+def _encode_path(index: int, tree_size: int, proof: list) -> bytes:
+    sizes = _level_sizes(tree_size)
+    if len(proof) != len(sizes) - 1:
+        raise ValueError("proof length does not match tree size")
+    out = []
+    for size, sibling_hash in zip(sizes, proof):
+        if index ^ 1 < size:
+            out.append(sibling_hash)
+        index //= 2
+    return b''.join(out)
+
+
+def _decode_path(blob: bytes, offset: int, index: int, tree_size: int) -> tuple:
+    """从 offset 处读出叶子 index 的兄弟摘要，返回 (proof, 新 offset)；自配对位置为 None"""
+    proof = []
+    for size in _level_sizes(tree_size)[:-1]:
+        if index ^ 1 < size:
+            if offset + HASH_SIZE > len(blob):
+                raise ValueError("truncated proof")
+            proof.append(blob[offset:offset + HASH_SIZE])
+            offset += HASH_SIZE
+        else:
+            proof.append(None)
+        index //= 2
+    return proof, offset
+
+
+def encode_proof(index: int, tree_size: int, proof: list) -> bytes:
+    return _PROOF_HEADER.pack(index, tree_size) + _encode_path(index, tree_size, proof)
+
+
+def decode_proof(blob: bytes) -> tuple:
+    """返回 (index, tree_size, proof)；自配对位置为 None"""
+    if len(blob) < _PROOF_HEADER.size:
+        raise ValueError("truncated proof")
+    index, tree_size = _PROOF_HEADER.unpack_from(blob, 0)
+    proof, offset = _decode_path(blob, _PROOF_HEADER.size, index, tree_size)
+    if offset != len(blob):
+        raise ValueError("trailing bytes in proof")
+    return index, tree_size, proof
+
+
+# 不存在性证明: 插入位置(8) || 树规模(8) || [左邻叶子摘要 || 兄弟摘要] || [右邻叶子摘要 || 兄弟摘要]
+# 左侧仅在 pos > 0、右侧仅在 pos < tree_size 时出现，因此无需额外标志位
+
+def encode_exclusion_proof(tree_size: int, proof: tuple) -> bytes:
+    pos, left_hash, left_proof, right_hash, right_proof = proof
+    if not 0 <= pos <= tree_size:
+        raise ValueError("position out of range")
+    out = [_PROOF_HEADER.pack(pos, tree_size)]
+    if pos > 0:
+        out += [left_hash, _encode_path(pos - 1, tree_size, left_proof)]
+    if pos < tree_size:
+        out += [right_hash, _encode_path(pos, tree_size, right_proof)]
+    return b''.join(out)
+
+
+def decode_exclusion_proof(blob: bytes) -> tuple:
+    """返回 (tree_size, proof)，proof 的格式与 get_exclusion_proof() 相同"""
+    if len(blob) < _PROOF_HEADER.size:
+        raise ValueError("truncated proof")
+    pos, tree_size = _PROOF_HEADER.unpack_from(blob, 0)
+    if pos > tree_size:
+        raise ValueError("position out of range")
+    offset = _PROOF_HEADER.size
+    sides = []
+    for present, index in ((pos > 0, pos - 1), (pos < tree_size, pos)):
+        if not present:
+            sides += [None, []]
+            continue
+        if offset + HASH_SIZE > len(blob):
+            raise ValueError("truncated proof")
+        leaf_hash = blob[offset:offset + HASH_SIZE]
+        path, offset = _decode_path(blob, offset + HASH_SIZE, index, tree_size)
+        sides += [leaf_hash, path]
+    if offset != len(blob):
+        raise ValueError("trailing bytes in proof")
+    return tree_size, (pos, *sides)
+
+
+def _multiproof_root(leaf_count: int, indices, leaf_hashes, proof: list) -> bytes:
+    """由若干叶子摘要与 get_multiproof() 的证明重建根；证明格式不符时抛出 ValueError"""
+    nodes = {}
+    for index, leaf_hash in zip(indices, leaf_hashes):
+        if not 0 <= index < leaf_count or nodes.setdefault(index, leaf_hash) != leaf_hash:
+            raise ValueError("invalid or conflicting leaf index")
+    if not nodes:
+        raise ValueError("no leaves to verify")
+    
+    proof_iter = iter(proof)
+    known = sorted(nodes)
+    for size in _level_sizes(leaf_count)[:-1]:
+        parents = []
+        messages = []
+        i = 0
+        while i < len(known):
+            index = known[i]
+            sibling_index = index ^ 1
+            if index % 2 == 0 and i + 1 < len(known) and known[i + 1] == sibling_index:
+                left, right = nodes[index], nodes[sibling_index]
+                i += 2
+            else:
+                if sibling_index < size:
+                    sibling = next(proof_iter, None)
+                    if sibling is None:
+                        raise ValueError("proof too short")
+                    if not _is_digest(sibling):
+                        raise ValueError("malformed proof entry")
+                else:
+                    sibling = nodes[index]
+                left, right = (sibling, nodes[index]) if index % 2 else (nodes[index], sibling)
+                i += 1
+            parents.append(index // 2)
+            messages.append(b'\x01' + left + right)
+        nodes = dict(zip(parents, sm3_many(messages)))
+        known = parents
+    if next(proof_iter, None) is not None:
+        raise ValueError("proof too long")
+    return nodes[0]
+
 
 def test_merkle_tree():
     print("生成100,000个叶子节点...")
     data_list = [os.urandom(32) for _ in range(100000)]
     
     print("构建Merkle树...")
-    merkle_tree = MerkleTree(data_list)
+    merkle_tree = MerkleTree(data_list, sorted_leaves=True)
     print(f"Merkle根: {merkle_tree.root().hex()}")
     print(f"树高度: {len(merkle_tree.tree)}")
     
     print("\n测试存在性证明:")
-    test_index = 50000
-    test_data = data_list[test_index]
+    test_data = data_list[50000]
+    test_index = merkle_tree.find_leaf(test_data)
     proof = merkle_tree.get_inclusion_proof(test_index)
     print(f"叶子 {test_index} 的证明路径长度: {len(proof)}")
     
@@ -194,13 +660,16 @@ def test_merkle_tree():
     while non_existent_data in data_list:
         non_existent_data = os.urandom(32)
     
-    pos, left_proof, right_proof = merkle_tree.get_exclusion_proof(non_existent_data)
+    exclusion_proof = merkle_tree.get_exclusion_proof(non_existent_data)
+    pos, _, left_proof, _, right_proof = exclusion_proof
     print(f"插入位置: {pos}")
     print(f"左证明长度: {len(left_proof)}")
     print(f"右证明长度: {len(right_proof)}")
     
-    is_valid = merkle_tree.verify_exclusion(non_existent_data, pos, left_proof, right_proof)
-    print(f"不存在性证明验证: {'成功' if is_valid else '失败'}")
+    blob = encode_exclusion_proof(merkle_tree.leaf_count, exclusion_proof)
+    tree_size, decoded = decode_exclusion_proof(blob)
+    is_valid = verify_exclusion_proof(merkle_tree.root(), tree_size, non_existent_data, decoded)
+    print(f"不存在性证明 ({len(blob)} 字节) 验证: {'成功' if is_valid else '失败'}")
 
 if __name__ == "__main__":
     test_merkle_tree()
\ No newline at end of file
@@ -1,45 +1,182 @@
+import ctypes
+import os
 import struct
 
-def sm3(message: bytes) -> bytes:
-    IV = [0x7380166F, 0x4914B2B9, 0x172442D7, 0xDA8A0600,
-          0xA96F30BC, 0x163138AA, 0xE38DEE4D, 0xB0FB0E4E]
-    T = [0x79CC4519] * 16 + [0x7A879D8A] * 48
-
-    msg_len = len(message) * 8
-    message += b'\x80'
-    while (len(message) * 8) % 512 != 448:
-        message += b'\x00'
-    message += struct.pack('>Q', msg_len)
-
-    registers = IV.copy()
-    for i in range(0, len(message), 64):
-        block = message[i:i+64]
-        W = list(struct.unpack('>16I', block)) + [0] * 52
-        for j in range(16, 68):
-            W[j] = P1(W[j-16] ^ W[j-9] ^ rotl(W[j-3], 15)) ^ rotl(W[j-13], 7) ^ W[j-6]
-        W_prime = [W[j] ^ W[j+4] for j in range(64)]
-
-        A, B, C, D, E, F, G, H = registers
-        for j in range(64):
-            SS1 = rotl((rotl(A, 12) + E + rotl(T[j], j)) & 0xFFFFFFFF, 7)
-            SS2 = SS1 ^ rotl(A, 12)
-            TT1 = (FF(A, B, C, j) + D + SS2 + W_prime[j]) & 0xFFFFFFFF
-            TT2 = (GG(E, F, G, j) + H + SS1 + W[j]) & 0xFFFFFFFF
-            D = C
-            C = rotl(B, 9)
-            B = A
-            A = TT1
-            H = G
-            G = rotl(F, 19)
-            F = E
-            E = P0(TT2)
-
-        registers = [(x ^ y) & 0xFFFFFFFF for x, y in zip(registers, [A, B, C, D, E, F, G, H])]
-
-    return b''.join(struct.pack('>I', x) for x in registers)
+IV = [0x7380166F, 0x4914B2B9, 0x172442D7, 0xDA8A0600,
+      0xA96F30BC, 0x163138AA, 0xE38DEE4D, 0xB0FB0E4E]
+T = [0x79CC4519] * 16 + [0x7A879D8A] * 48
+
 
 def rotl(x, n): return ((x << n) | (x >> (32 - n))) & 0xFFFFFFFF
 def P0(x): return x ^ rotl(x, 9) ^ rotl(x, 17)
 def P1(x): return x ^ rotl(x, 15) ^ rotl(x, 23)
 def FF(a, b, c, j): return a ^ b ^ c if j < 16 else (a & b) | (a & c) | (b & c)
-def GG(e, f, g, j): return e ^ f ^ g if j < 16 else (e & f) | ((~e) & g)
\ No newline at end of file
+def GG(e, f, g, j): return e ^ f ^ g if j < 16 else (e & f) | ((~e) & g)
+
+
+def sm3(message: bytes) -> bytes:
+    if _lib is not None:
+        message = bytes(message)
+        out = ctypes.create_string_buffer(32)
+        _lib.sm3_hash(message, len(message), out)
+        return out.raw
+    return SM3(message).digest()
+
+
+def sm3_file(path, chunk_size: int = 1 << 20) -> bytes:
+    h = SM3()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.digest()
+
+
+_MASK = 0xFFFFFFFF
+# 预计算 64 个轮常量 (Tj <<< j mod 32)，压缩时不再逐轮移位
+_T_ROT = [rotl(t, j % 32) for j, t in enumerate(T)]
+
+
+def sm3_compress(V, block):
+    """单分组压缩函数 CF(V, B)：消息扩展内联，0-15 与 16-63 轮拆成两段无分支循环"""
+    M = _MASK
+    W = list(struct.unpack('>16I', block))
+    append = W.append
+    for j in range(16, 68):
+        x = W[j-16] ^ W[j-9]
+        w = W[j-3]
+        x ^= ((w << 15) | (w >> 17)) & M
+        w = W[j-13]
+        append(x ^ (((x << 15) | (x >> 17)) & M) ^ (((x << 23) | (x >> 9)) & M)
+               ^ (((w << 7) | (w >> 25)) & M) ^ W[j-6])
+
+    A, B, C, D, E, F, G, H = V
+    TR = _T_ROT
+    for j in range(16):
+        a12 = ((A << 12) | (A >> 20)) & M
+        SS1 = (a12 + E + TR[j]) & M
+        SS1 = ((SS1 << 7) | (SS1 >> 25)) & M
+        Wj = W[j]
+        TT1 = ((A ^ B ^ C) + D + (SS1 ^ a12) + (Wj ^ W[j+4])) & M
+        TT2 = ((E ^ F ^ G) + H + SS1 + Wj) & M
+        D = C
+        C = ((B << 9) | (B >> 23)) & M
+        B = A
+        A = TT1
+        H = G
+        G = ((F << 19) | (F >> 13)) & M
+        F = E
+        E = TT2 ^ (((TT2 << 9) | (TT2 >> 23)) & M) ^ (((TT2 << 17) | (TT2 >> 15)) & M)
+    for j in range(16, 64):
+        a12 = ((A << 12) | (A >> 20)) & M
+        SS1 = (a12 + E + TR[j]) & M
+        SS1 = ((SS1 << 7) | (SS1 >> 25)) & M
+        Wj = W[j]
+        TT1 = (((A & B) | (A & C) | (B & C)) + D + (SS1 ^ a12) + (Wj ^ W[j+4])) & M
+        TT2 = (((E & F) | (~E & G)) + H + SS1 + Wj) & M
+        D = C
+        C = ((B << 9) | (B >> 23)) & M
+        B = A
+        A = TT1
+        H = G
+        G = ((F << 19) | (F >> 13)) & M
+        F = E
+        E = TT2 ^ (((TT2 << 9) | (TT2 >> 23)) & M) ^ (((TT2 << 17) | (TT2 >> 15)) & M)
+
+    return [V[0] ^ A, V[1] ^ B, V[2] ^ C, V[3] ^ D,
+            V[4] ^ E, V[5] ^ F, V[6] ^ G, V[7] ^ H]
+
+
+def _compress_blocks(registers, data):
+    """依次压缩 data 中的整块 (长度为 64 的倍数)，优先使用 C 后端"""
+    if _lib is not None:
+        V = (ctypes.c_uint32 * 8)(*registers)
+        _lib.sm3_compress_blocks(V, bytes(data), len(data) // 64)
+        return list(V)
+    for i in range(0, len(data), 64):
+        registers = sm3_compress(registers, data[i:i+64])
+    return registers
+
+
+class SM3:
+    """hashlib 风格的流式 SM3：只缓存不足 64 字节的尾块，整块到达即压缩"""
+    name = 'sm3'
+    digest_size = 32
+    block_size = 64
+
+    def __init__(self, data: bytes = b''):
+        self._registers = IV.copy()
+        self._buffer = b''
+        self._length = 0
+        if data:
+            self.update(data)
+
+    def update(self, data: bytes) -> None:
+        data = memoryview(data).cast('B')
+        self._length += len(data)
+        if self._buffer:
+            need = 64 - len(self._buffer)
+            if len(data) < need:
+                self._buffer += data.tobytes()
+                return
+            self._registers = sm3_compress(self._registers, self._buffer + data[:need])
+            data = data[need:]
+        end = len(data) - len(data) % 64
+        if end:
+            self._registers = _compress_blocks(self._registers, data[:end])
+        self._buffer = bytes(data[end:])
+
+    def digest(self) -> bytes:
+        # 填充: 0x80 || 0x00... || 64 位消息比特长度，最多多出两个分组
+        tail = self._buffer + b'\x80' + b'\x00' * ((55 - len(self._buffer)) % 64)
+        tail += struct.pack('>Q', (self._length * 8) & 0xFFFFFFFFFFFFFFFF)
+        return struct.pack('>8I', *_compress_blocks(self._registers, tail))
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+    @classmethod
+    def from_state(cls, state: bytes, length: int = 0) -> 'SM3':
+        """从链接变量恢复：state 为已吸收 length 字节 (64 的倍数) 后的 32 字节中间状态"""
+        if length % 64:
+            raise ValueError("length must be a multiple of the 64-byte block size")
+        h = cls.__new__(cls)
+        h._registers = list(struct.unpack('>8I', state))
+        h._buffer = b''
+        h._length = length
+        return h
+
+    def state(self) -> bytes:
+        """当前链接变量 (不含未满一块的缓存)"""
+        return struct.pack('>8I', *self._registers)
+
+    def copy(self) -> 'SM3':
+        other = SM3.__new__(SM3)
+        other._registers = self._registers.copy()
+        other._buffer = self._buffer
+        other._length = self._length
+        return other
+
+
+def _load_backend():
+    """加载 sm3_c.c 编译出的共享库；未编译或设置 SM3_BACKEND=python 时返回 None"""
+    if os.environ.get('SM3_BACKEND', '').lower() == 'python':
+        return None
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in ('libsm3.so', 'libsm3.dylib', 'sm3.dll'):
+        path = os.path.join(here, name)
+        if not os.path.exists(path):
+            continue
+        try:
+            lib = ctypes.CDLL(path)
+        except OSError:
+            continue
+        lib.sm3_compress_blocks.argtypes = [ctypes.POINTER(ctypes.c_uint32), ctypes.c_char_p, ctypes.c_size_t]
+        lib.sm3_compress_blocks.restype = None
+        lib.sm3_hash.argtypes = [ctypes.c_char_p, ctypes.c_size_t, ctypes.c_char_p]
+        lib.sm3_hash.restype = None
+        return lib
+    return None
+
+
+_lib = _load_backend()
+BACKEND = 'c' if _lib is not None else 'python'
@@ -0,0 +1,96 @@
+/*
+ * SM3 C 后端（可选），供 sm3.py 通过 ctypes 加载。
+ * 编译（在 project4 目录下）：
+ *   gcc -O3 -shared -fPIC sm3_c.c -o libsm3.so
+ * 未编译时 sm3.py 自动使用纯 Python 实现。
+ */
+#include <stdint.h>
+#include <stddef.h>
+#include <string.h>
+
+typedef uint32_t u32;
+typedef uint8_t u8;
+
+static const u32 IV[8] = {
+    0x7380166F, 0x4914B2B9, 0x172442D7, 0xDA8A0600,
+    0xA96F30BC, 0x163138AA, 0xE38DEE4D, 0xB0FB0E4E
+};
+
+/* Tj <<< (j mod 32)，预先算好 */
+static const u32 T_ROT[64] = {
+    0x79CC4519,0xF3988A32,0xE7311465,0xCE6228CB,0x9CC45197,0x3988A32F,0x7311465E,0xE6228CBC,
+    0xCC451979,0x988A32F3,0x311465E7,0x6228CBCE,0xC451979C,0x88A32F39,0x11465E73,0x228CBCE6,
+    0x9D8A7A87,0x3B14F50F,0x7629EA1E,0xEC53D43C,0xD8A7A879,0xB14F50F3,0x629EA1E7,0xC53D43CE,
+    0x8A7A879D,0x14F50F3B,0x29EA1E76,0x53D43CEC,0xA7A879D8,0x4F50F3B1,0x9EA1E762,0x3D43CEC5,
+    0x7A879D8A,0xF50F3B14,0xEA1E7629,0xD43CEC53,0xA879D8A7,0x50F3B14F,0xA1E7629E,0x43CEC53D,
+    0x879D8A7A,0x0F3B14F5,0x1E7629EA,0x3CEC53D4,0x79D8A7A8,0xF3B14F50,0xE7629EA1,0xCEC53D43,
+    0x9D8A7A87,0x3B14F50F,0x7629EA1E,0xEC53D43C,0xD8A7A879,0xB14F50F3,0x629EA1E7,0xC53D43CE,
+    0x8A7A879D,0x14F50F3B,0x29EA1E76,0x53D43CEC,0xA7A879D8,0x4F50F3B1,0x9EA1E762,0x3D43CEC5
+};
+
+static inline u32 rotl32(u32 x, int n) {
+    return (x << n) | (x >> ((32 - n) & 31));
+}
+
+#define P0(x) ((x) ^ rotl32((x), 9) ^ rotl32((x), 17))
+#define P1(x) ((x) ^ rotl32((x), 15) ^ rotl32((x), 23))
+
+static inline u32 load_be32(const u8 *p) {
+    return ((u32)p[0] << 24) | ((u32)p[1] << 16) | ((u32)p[2] << 8) | (u32)p[3];
+}
+
+static inline void store_be32(u8 *p, u32 v) {
+    p[0] = (u8)(v >> 24); p[1] = (u8)(v >> 16); p[2] = (u8)(v >> 8); p[3] = (u8)v;
+}
+
+#define ROUND(j, FFv, GGv) do {                                   \
+        u32 a12 = rotl32(A, 12);                                  \
+        u32 SS1 = rotl32(a12 + E + T_ROT[j], 7);                  \
+        u32 TT1 = (FFv) + D + (SS1 ^ a12) + (W[j] ^ W[(j) + 4]);  \
+        u32 TT2 = (GGv) + H + SS1 + W[j];                         \
+        D = C; C = rotl32(B, 9); B = A; A = TT1;                  \
+        H = G; G = rotl32(F, 19); F = E; E = P0(TT2);             \
+    } while (0)
+
+void sm3_compress_blocks(u32 V[8], const u8 *data, size_t nblocks) {
+    u32 W[68];
+    for (size_t blk = 0; blk < nblocks; blk++, data += 64) {
+        for (int j = 0; j < 16; j++)
+            W[j] = load_be32(data + 4 * j);
+        for (int j = 16; j < 68; j++) {
+            u32 x = W[j - 16] ^ W[j - 9] ^ rotl32(W[j - 3], 15);
+            W[j] = P1(x) ^ rotl32(W[j - 13], 7) ^ W[j - 6];
+        }
+
+        u32 A = V[0], B = V[1], C = V[2], D = V[3];
+        u32 E = V[4], F = V[5], G = V[6], H = V[7];
+        for (int j = 0; j < 16; j++)
+            ROUND(j, A ^ B ^ C, E ^ F ^ G);
+        for (int j = 16; j < 64; j++)
+            ROUND(j, (A & B) | (A & C) | (B & C), (E & F) | (~E & G));
+
+        V[0] ^= A; V[1] ^= B; V[2] ^= C; V[3] ^= D;
+        V[4] ^= E; V[5] ^= F; V[6] ^= G; V[7] ^= H;
+    }
+}
+
+void sm3_hash(const u8 *msg, size_t len, u8 out[32]) {
+    u32 V[8];
+    u8 tail[128];
+    size_t full = len / 64, rest = len % 64;
+    size_t tail_len = rest < 56 ? 64 : 128;
+    uint64_t bits = (uint64_t)len << 3;
+
+    memcpy(V, IV, sizeof(V));
+    sm3_compress_blocks(V, msg, full);
+
+    memset(tail, 0, sizeof(tail));
+    memcpy(tail, msg + 64 * full, rest);
+    tail[rest] = 0x80;
+    for (int i = 0; i < 8; i++)
+        tail[tail_len - 1 - i] = (u8)(bits >> (8 * i));
+    sm3_compress_blocks(V, tail, tail_len / 64);
+
+    for (int i = 0; i < 8; i++)
+        store_be32(out + 4 * i, V[i]);
+}
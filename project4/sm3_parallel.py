@@ -0,0 +1,53 @@
+"""多进程 SM3：把相互独立的消息/文件按批分发到 ProcessPoolExecutor，结果按输入顺序返回"""
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from sm3 import sm3_file
+from sm3_batch import sm3_many
+
+
+def _batches(items, batch_size):
+    it = iter(items)
+    while True:
+        batch = list(islice(it, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _hash_messages(batch):
+    return sm3_many(batch)
+
+
+def _hash_files(batch):
+    return [sm3_file(path) for path in batch]
+
+
+def _run(worker, items, workers, batch_size):
+    if batch_size < 1:
+        raise ValueError("batch_size must be positive")
+    if workers == 1:
+        return [h for batch in _batches(items, batch_size) for h in worker(batch)]
+    out = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for hashes in pool.map(worker, _batches(items, batch_size)):
+            out.extend(hashes)
+    return out
+
+
+def sm3_parallel(messages, workers: int = None, batch_size: int = 1024) -> list:
+    """并行计算多条消息的 SM3；workers 默认为 CPU 核数，workers=1 时在本进程内计算"""
+    return _run(_hash_messages, messages, workers, batch_size)
+
+
+def sm3_files_parallel(paths, workers: int = None, batch_size: int = 16) -> list:
+    """并行计算多个文件的 SM3 (每个文件流式读取，内存占用恒定)"""
+    return _run(_hash_files, [os.fspath(p) for p in paths], workers, batch_size)
+
+
+if __name__ == "__main__":
+    files = sys.argv[1:]
+    for path, digest in zip(files, sm3_files_parallel(files)):
+        print(f"{digest.hex()}  {path}")
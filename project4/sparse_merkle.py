@@ -0,0 +1,133 @@
+"""稀疏 Merkle 树：以 SM3(key) 的 256 位作为路径，空子树的哈希按深度预先缓存，
+只存储非空结点；存在性与不存在性证明都只需 256 次哈希，并用位图省略默认兄弟"""
+import os
+import struct
+
+from sm3 import sm3
+
+DEPTH = 256
+HASH_SIZE = 32
+EMPTY_LEAF = b'\x00' * HASH_SIZE
+
+
+def _default_hashes() -> list:
+    """DEFAULT_HASHES[d] 为深度 d 处空子树的根 (d=256 为空叶子，d=0 为空树的根)"""
+    hashes = [EMPTY_LEAF] * (DEPTH + 1)
+    for depth in range(DEPTH - 1, -1, -1):
+        child = hashes[depth + 1]
+        hashes[depth] = sm3(b'\x01' + child + child)
+    return hashes
+
+
+DEFAULT_HASHES = _default_hashes()
+
+
+def _path(key: bytes) -> int:
+    return int.from_bytes(sm3(key), 'big')
+
+
+def leaf_hash(value: bytes) -> bytes:
+    return sm3(b'\x00' + value)
+
+
+class SparseMerkleTree:
+    def __init__(self, store=None):
+        """store 为任意 bytes -> bytes 的映射 (默认 dict，也可传入 dbm 等以 bytes 为键的磁盘 KV；
+        shelve 只接受 str 键，不能直接使用)，只保存与默认值不同的结点"""
+        self.store = {} if store is None else store
+
+    @staticmethod
+    def _node_key(depth: int, prefix: int) -> bytes:
+        return struct.pack('>H', depth) + prefix.to_bytes(HASH_SIZE, 'big')
+
+    def _get(self, depth: int, prefix: int) -> bytes:
+        node = self.store.get(self._node_key(depth, prefix))
+        return DEFAULT_HASHES[depth] if node is None else bytes(node)
+
+    def _put(self, depth: int, prefix: int, node: bytes) -> None:
+        key = self._node_key(depth, prefix)
+        if node == DEFAULT_HASHES[depth]:
+            if key in self.store:
+                del self.store[key]
+        else:
+            self.store[key] = node
+
+    def root(self) -> bytes:
+        return self._get(0, 0)
+
+    def update(self, key: bytes, value: bytes) -> bytes:
+        """写入 key -> value (value 为 None 表示删除)，沿路径重算 256 个结点，返回新根"""
+        prefix = _path(key)
+        node = EMPTY_LEAF if value is None else leaf_hash(value)
+        self._put(DEPTH, prefix, node)
+        for depth in range(DEPTH, 0, -1):
+            sibling = self._get(depth, prefix ^ 1)
+            if prefix & 1:
+                node = sm3(b'\x01' + sibling + node)
+            else:
+                node = sm3(b'\x01' + node + sibling)
+            prefix >>= 1
+            self._put(depth - 1, prefix, node)
+        return node
+
+    def delete(self, key: bytes) -> bytes:
+        return self.update(key, None)
+
+    def contains(self, key: bytes) -> bool:
+        return self._get(DEPTH, _path(key)) != EMPTY_LEAF
+
+    def get_proof(self, key: bytes) -> tuple:
+        """返回 (bitmap, siblings)：siblings 自叶向根只含非默认兄弟，
+        bitmap 的第 i 位为 1 表示第 i 层 (自叶向根) 的兄弟在 siblings 中"""
+        prefix = _path(key)
+        bitmap = 0
+        siblings = []
+        for i, depth in enumerate(range(DEPTH, 0, -1)):
+            sibling = self._get(depth, prefix ^ 1)
+            if sibling != DEFAULT_HASHES[depth]:
+                bitmap |= 1 << i
+                siblings.append(sibling)
+            prefix >>= 1
+        return bitmap, siblings
+
+
+def verify_proof(root: bytes, key: bytes, value, proof: tuple) -> bool:
+    """value 为 bytes 时验证存在性，为 None 时验证不存在性 (该路径叶子为空)"""
+    bitmap, siblings = proof
+    if bitmap >> DEPTH or bin(bitmap).count('1') != len(siblings):
+        return False
+    prefix = _path(key)
+    node = EMPTY_LEAF if value is None else leaf_hash(value)
+    sibling_iter = iter(siblings)
+    for i, depth in enumerate(range(DEPTH, 0, -1)):
+        sibling = next(sibling_iter) if bitmap >> i & 1 else DEFAULT_HASHES[depth]
+        if prefix & 1:
+            node = sm3(b'\x01' + sibling + node)
+        else:
+            node = sm3(b'\x01' + node + sibling)
+        prefix >>= 1
+    return node == root
+
+
+def test_sparse_merkle_tree():
+    print("写入200个键值...")
+    smt = SparseMerkleTree()
+    items = {os.urandom(16): os.urandom(32) for _ in range(200)}
+    for key, value in items.items():
+        smt.update(key, value)
+    print(f"稀疏Merkle根: {smt.root().hex()}")
+    print(f"非空结点数: {len(smt.store)}")
+
+    key, value = next(iter(items.items()))
+    proof = smt.get_proof(key)
+    print(f"\n存在性证明: 非默认兄弟 {len(proof[1])} 个")
+    print(f"存在性证明验证: {'成功' if verify_proof(smt.root(), key, value, proof) else '失败'}")
+
+    missing = os.urandom(16)
+    proof = smt.get_proof(missing)
+    print(f"\n不存在性证明: 非默认兄弟 {len(proof[1])} 个")
+    print(f"不存在性证明验证: {'成功' if verify_proof(smt.root(), missing, None, proof) else '失败'}")
+
+
+if __name__ == "__main__":
+    test_sparse_merkle_tree()
@@ -0,0 +1,291 @@
+"""短 Weierstrass 曲线 y^2 = x^3 + ax + b (mod p) 的 Jacobian 坐标点运算。
+
+Jacobian 点 (X, Y, Z) 对应仿射点 (X/Z^2, Y/Z^3)；无穷远点用 None 表示 (与 sm2.py 一致)。
+点加、倍点都不做模逆，一次标量乘只在最后转回仿射坐标时求一次逆。
+"""
+from typing import Optional, Tuple
+
+Affine = Optional[Tuple[int, int]]
+Jacobian = Optional[Tuple[int, int, int]]
+
+
+def to_jacobian(P: Affine) -> Jacobian:
+    if P is None:
+        return None
+    return (P[0], P[1], 1)
+
+
+def to_affine(P: Jacobian, p: int) -> Affine:
+    if P is None:
+        return None
+    X, Y, Z = P
+    z_inv = pow(Z, -1, p)
+    z_inv2 = z_inv * z_inv % p
+    return (X * z_inv2 % p, Y * z_inv2 * z_inv % p)
+
+
+def batch_inverse(values: list, p: int) -> list:
+    """Montgomery 联合求逆：返回各元素模 p 的逆，只做一次模逆加约 3n 次乘法。
+    任一元素不可逆时抛出 ValueError (与 pow(x, -1, p) 一致)"""
+    prefix = []
+    acc = 1
+    for x in values:
+        acc = acc * x % p
+        prefix.append(acc)
+    inv = pow(acc, -1, p)
+    out = [0] * len(values)
+    for i in range(len(values) - 1, 0, -1):
+        # prefix[i-1] * inv = x_i^-1，随后把 x_i 从 inv 中剥离
+        out[i] = prefix[i - 1] * inv % p
+        inv = inv * values[i] % p
+    if values:
+        out[0] = inv
+    return out
+
+
+def batch_to_affine(points: list, p: int) -> list:
+    """批量转仿射坐标，所有 Z 共用一次 batch_inverse；None (无穷远点) 原样保留"""
+    z_invs = iter(batch_inverse([P[2] for P in points if P is not None], p))
+    out = []
+    for P in points:
+        if P is None:
+            out.append(None)
+            continue
+        z_inv = next(z_invs)
+        z_inv2 = z_inv * z_inv % p
+        out.append((P[0] * z_inv2 % p, P[1] * z_inv2 * z_inv % p))
+    return out
+
+
+def jacobian_neg(P: Jacobian, p: int) -> Jacobian:
+    if P is None:
+        return None
+    return (P[0], -P[1] % p, P[2])
+
+
+def jacobian_double(P: Jacobian, a: int, p: int) -> Jacobian:
+    if P is None:
+        return None
+    X1, Y1, Z1 = P
+    if Y1 == 0:
+        return None
+    XX = X1 * X1 % p
+    YY = Y1 * Y1 % p
+    ZZ = Z1 * Z1 % p
+    S = 4 * X1 * YY % p
+    M = (3 * XX + a * ZZ * ZZ) % p
+    X3 = (M * M - 2 * S) % p
+    Y3 = (M * (S - X3) - 8 * YY * YY) % p
+    Z3 = 2 * Y1 * Z1 % p
+    return (X3, Y3, Z3)
+
+
+def jacobian_add_affine(P: Jacobian, Q: Affine, a: int, p: int) -> Jacobian:
+    """混合加法 P + Q，Q 为仿射点 (Z=1)，比一般加法少 4 次乘法"""
+    if Q is None:
+        return P
+    if P is None:
+        return to_jacobian(Q)
+    X1, Y1, Z1 = P
+    x2, y2 = Q
+    Z1Z1 = Z1 * Z1 % p
+    H = (x2 * Z1Z1 - X1) % p
+    r = (y2 * Z1 * Z1Z1 - Y1) % p
+    if H == 0:
+        return jacobian_double(P, a, p) if r == 0 else None
+    HH = H * H % p
+    HHH = H * HH % p
+    V = X1 * HH % p
+    X3 = (r * r - HHH - 2 * V) % p
+    Y3 = (r * (V - X3) - Y1 * HHH) % p
+    Z3 = Z1 * H % p
+    return (X3, Y3, Z3)
+
+
+def jacobian_add(P: Jacobian, Q: Jacobian, a: int, p: int) -> Jacobian:
+    if P is None:
+        return Q
+    if Q is None:
+        return P
+    X1, Y1, Z1 = P
+    X2, Y2, Z2 = Q
+    Z1Z1 = Z1 * Z1 % p
+    Z2Z2 = Z2 * Z2 % p
+    U1 = X1 * Z2Z2 % p
+    S1 = Y1 * Z2 * Z2Z2 % p
+    H = (X2 * Z1Z1 - U1) % p
+    r = (Y2 * Z1 * Z1Z1 - S1) % p
+    if H == 0:
+        return jacobian_double(P, a, p) if r == 0 else None
+    HH = H * H % p
+    HHH = H * HH % p
+    V = U1 * HH % p
+    X3 = (r * r - HHH - 2 * V) % p
+    Y3 = (r * (V - X3) - S1 * HHH) % p
+    Z3 = Z1 * Z2 * H % p
+    return (X3, Y3, Z3)
+
+
+def jacobian_mul(k: int, P: Affine, a: int, p: int) -> Jacobian:
+    """kP (k >= 0)，从高位到低位的倍点-加法，结果保持 Jacobian 坐标"""
+    if P is None or k == 0:
+        return None
+    R = None
+    for bit in bin(k)[2:]:
+        R = jacobian_double(R, a, p)
+        if bit == '1':
+            R = jacobian_add_affine(R, P, a, p)
+    return R
+
+
+def wnaf(k: int, w: int) -> list:
+    """宽度 w 的 NAF 表示 (低位在前)：非零数字均为奇数且 |d| < 2^(w-1)，
+    任意 w 个相邻数字中至多一个非零"""
+    digits = []
+    while k:
+        if k & 1:
+            d = k & ((1 << w) - 1)
+            if d >= 1 << (w - 1):
+                d -= 1 << w
+            k -= d
+        else:
+            d = 0
+        digits.append(d)
+        k >>= 1
+    return digits
+
+
+def odd_multiples(P: Affine, a: int, p: int, w: int) -> list:
+    """[P, 3P, 5P, ..., (2^(w-1)-1)P]，仿射坐标，供 wNAF 查表"""
+    P2 = to_affine(jacobian_double(to_jacobian(P), a, p), p)
+    acc = to_jacobian(P)
+    points = [acc]
+    for _ in range((1 << (w - 2)) - 1):
+        acc = jacobian_add_affine(acc, P2, a, p)
+        points.append(acc)
+    return batch_to_affine(points, p)
+
+
+def wnaf_mul(k: int, P: Affine, a: int, p: int, w: int = 5, table: list = None) -> Jacobian:
+    """wNAF 变基点标量乘 (k >= 0)：256 次倍点 + 约 256/(w+1) 次加法；
+    table 为 odd_multiples(P, a, p, w)，可对同一点复用"""
+    if P is None or k == 0:
+        return None
+    if table is None:
+        table = odd_multiples(P, a, p, w)
+    R = None
+    for d in reversed(wnaf(k, w)):
+        R = jacobian_double(R, a, p)
+        if d > 0:
+            R = jacobian_add_affine(R, table[d >> 1], a, p)
+        elif d < 0:
+            x, y = table[-d >> 1]
+            R = jacobian_add_affine(R, (x, -y % p), a, p)
+    return R
+
+
+def double_scalar_mul(k1: int, P1: Affine, k2: int, P2: Affine, a: int, p: int,
+                      w1: int = 5, w2: int = 5, table1: list = None, table2: list = None) -> Jacobian:
+    """Straus/Shamir 联合标量乘 k1*P1 + k2*P2 (k1, k2 >= 0)：两个 wNAF 交错使用同一条倍点链，
+    倍点次数只取决于较长的标量；table1/table2 为各自的 odd_multiples，可预先缓存"""
+    length = 0
+    terms = []
+    for k, P, w, table in ((k1, P1, w1, table1), (k2, P2, w2, table2)):
+        if k and P is not None:
+            if table is None:
+                table = odd_multiples(P, a, p, w)
+            # 预先合并正负查表：lookup[d] = dP，负数字直接索引到 -|d|P
+            lookup = {}
+            for j, (x, y) in enumerate(table):
+                lookup[2 * j + 1] = (x, y)
+                lookup[-2 * j - 1] = (x, -y % p)
+            digits = wnaf(k, w)
+            length = max(length, len(digits))
+            terms.append((digits, lookup))
+    if not terms:
+        return None
+    if len(terms) == 1:
+        terms.append(([], {}))
+    (d1, t1), (d2, t2) = terms
+    d1 = d1 + [0] * (length - len(d1))
+    d2 = d2 + [0] * (length - len(d2))
+    R = None
+    for x, y in zip(reversed(d1), reversed(d2)):
+        R = jacobian_double(R, a, p)
+        if x:
+            R = jacobian_add_affine(R, t1[x], a, p)
+        if y:
+            R = jacobian_add_affine(R, t2[y], a, p)
+    return R
+
+
+_ODD_MULTIPLES = {}
+
+
+def cached_odd_multiples(P: Affine, a: int, p: int, w: int) -> list:
+    """按 (P, 曲线, w) 缓存 odd_multiples，适合固定基点使用较宽的窗口"""
+    key = (P, a, p, w)
+    table = _ODD_MULTIPLES.get(key)
+    if table is None:
+        table = _ODD_MULTIPLES[key] = odd_multiples(P, a, p, w)
+    return table
+
+
+def scalar_mul(k: int, P: Affine, a: int, p: int) -> Affine:
+    if P is None or k == 0:
+        return None
+    if k < 0:
+        k, P = -k, (P[0], -P[1] % p)
+    return to_affine(wnaf_mul(k, P, a, p), p)
+
+
+class FixedBaseTable:
+    """固定基点窗口预计算表：rows[i][j-1] = j * 2^(w*i) * P (j = 1..2^w-1)，存为仿射坐标。
+
+    k 按 w 位一组拆成 ceil(bits/w) 个数字，kP = Σ rows[i][digit_i]，
+    只需 bits/w 次混合加法，不需要任何倍点。
+    """
+
+    def __init__(self, P: Affine, a: int, p: int, bits: int = 256, window: int = 4):
+        self.a = a
+        self.p = p
+        self.window = window
+        self.bits = bits
+        self.rows = []
+        base = P
+        for _ in range((bits + window - 1) // window):
+            # 一行 2^w - 1 个点连同下一行的基点一起批量转仿射，每行只求一次逆
+            acc = to_jacobian(base)
+            row = [acc]
+            for _ in range((1 << window) - 1):
+                acc = jacobian_add_affine(acc, base, a, p)
+                row.append(acc)
+            row = batch_to_affine(row, p)
+            base = row.pop()
+            self.rows.append(row)
+
+    def mul(self, k: int) -> Jacobian:
+        """0 <= k < 2^bits"""
+        if k >> self.bits:
+            raise ValueError("scalar too large for this table")
+        a, p = self.a, self.p
+        mask = (1 << self.window) - 1
+        R = None
+        for row in self.rows:
+            digit = k & mask
+            if digit:
+                R = jacobian_add_affine(R, row[digit - 1], a, p)
+            k >>= self.window
+        return R
+
+
+_FIXED_BASE_TABLES = {}
+
+
+def fixed_base_table(P: Affine, a: int, p: int, bits: int = 256, window: int = 4) -> FixedBaseTable:
+    """按 (P, 曲线, bits, window) 缓存的预计算表，首次使用时才构建"""
+    key = (P, a, p, bits, window)
+    table = _FIXED_BASE_TABLES.get(key)
+    if table is None:
+        table = _FIXED_BASE_TABLES[key] = FixedBaseTable(P, a, p, bits, window)
+    return table
@@ -15,7 +15,7 @@ O = None  # Point at infinity
 # Basic EC point operations
 
 def inv_mod(x: int, p: int) -> int:
-    return pow(x, p-2, p)
+    return pow(x, -1, p)
 
 def is_on_curve(P):
     if P is None:
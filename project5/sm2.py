@@ -1,8 +1,16 @@
 
 from __future__ import annotations
-import struct, math, secrets, hmac
+import os, sys, math, secrets, threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from typing import Tuple, Optional, Callable
 
+# SM3 实现与 project4 共用
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'project4'))
+from sm3 import SM3, sm3
+from sm3_batch import sm3_many
+import ecc
+
 
 q  = int("8542D69E4C044F18E8B92435BF6FF7DE457283915C45517D722EDB8B08F1DFC3", 16)
 a  = int("787968B4FA32C3FD2417842E73BBFEFF2F3C848B6831D7E0EC65228B3937E498", 16)
@@ -11,10 +19,12 @@ Gx = int("421DEBD61B62EAB6746434EBC3CC315E32220B3BADD50BDC4C4E6C147FEDD43D", 16)
 Gy = int("0680512BCBB42C07D47349D2153B70C4E5D7FDFCBFA36EA1A85841B9E46E09A2", 16)
 n  = int("8542D69E4C044F18E8B92435BF6FF7DD297720630485628D5AE74EE7C32E79B7", 16)
 O = None  # point at infinity representation
+G_WNAF_WINDOW = 7  # 验签中 sG 的 wNAF 窗口，G 的奇数倍表只构建一次
+PA_WNAF_WINDOW = 5  # 公钥 PA 的 wNAF 窗口
 
 
 def inv_mod(x: int, p: int) -> int:
-    return pow(x % p, p-2, p)
+    return pow(x, -1, p)
 
 def is_on_curve(P: Optional[Tuple[int,int]]) -> bool:
     if P is None: return True
@@ -37,132 +47,89 @@ def point_add(P, Q):
     return (x3, y3)
 
 def scalar_mul(k: int, P):
+    # Jacobian 坐标计算，整个标量乘只在最后做一次模逆；基点为 G 时查固定基点表
     if P is None or k % n == 0:
         return None
-    if k < 0:
-        return scalar_mul(-k, (P[0], (-P[1]) % q))
-    R = None
-    N = P
-    while k:
-        if k & 1:
-            R = point_add(R, N)
-        N = point_add(N, N)
-        k >>= 1
-    return R
-
-
-IV = [
-    0x7380166F,0x4914B2B9,0x172442D7,0xDA8A0600,
-    0xA96F30BC,0x163138AA,0xE38DEE4D,0xB0FB0E4E
-]
-
-T_j = [0x79cc4519]*16 + [0x7a879d8a]*48
-
-def _rotl(x, n):
-    return ((x << n) & 0xFFFFFFFF) | (x >> (32-n))
-
-def _P0(x): return x ^ _rotl(x,9) ^ _rotl(x,17)
-def _P1(x): return x ^ _rotl(x,15) ^ _rotl(x,23)
-
-def sm3_compress(V, B):
-    W = []
-    for i in range(16):
-        W.append(int.from_bytes(B[4*i:4*i+4], 'big'))
-    for j in range(16,68):
-        x = W[j-16] ^ W[j-9] ^ _rotl(W[j-3],15)
-        W.append(_P1(x) ^ _rotl(W[j-13],7) ^ W[j-6])
-    W_ = [W[j] ^ W[j+4] for j in range(64)]
-
-    A,Bb,C,D,E,F,G,H = V
-    for j in range(64):
-        SS1 = _rotl((_rotl(A,12) + E + _rotl(T_j[j], j % 32)) & 0xFFFFFFFF, 7)
-        SS2 = SS1 ^ _rotl(A,12)
-        if j <= 15:
-            FF = A ^ Bb ^ C
-            GG = E ^ F ^ G
-        else:
-            FF = (A & Bb) | (A & C) | (Bb & C)
-            GG = (E & F) | ((~E) & G)
-        TT1 = (FF + D + SS2 + W_[j]) & 0xFFFFFFFF
-        TT2 = (GG + H + SS1 + W[j]) & 0xFFFFFFFF
-        D = C
-        C = _rotl(Bb,9)
-        Bb = A
-        A = TT1
-        H = G
-        G = _rotl(F,19)
-        F = E
-        E = _P0(TT2)
-    return [(V[i] ^ x) & 0xFFFFFFFF for i,x in enumerate([A,Bb,C,D,E,F,G,H])]
-
-def sm3_hash(msg: bytes) -> bytes:
-    msg = bytearray(msg)
-    l = len(msg) * 8
-    msg.append(0x80)
-    while ((len(msg)*8) % 512) != 448:
-        msg.append(0x00)
-    msg += l.to_bytes(8,'big')
-    V = IV[:]
-    for i in range(0, len(msg), 64):
-        B = bytes(msg[i:i+64])
-        V = sm3_compress(V, B)
-    out = b''.join(v.to_bytes(4,'big') for v in V)
-    return out
+    if P == (Gx, Gy):
+        return ecc.to_affine(ecc.fixed_base_table(P, a, q, n.bit_length()).mul(k % n), q)
+    return ecc.scalar_mul(k, P, a, q)
+
+
+sm3_hash = sm3
 
 
 def sm3_int(msg: bytes) -> int:
     return int.from_bytes(sm3_hash(msg), 'big')
 
 
-def hmac_sm3(key: bytes, data: bytes) -> bytes:
+class HmacSM3:
+    """HMAC-SM3：构造时吸收 ipad/opad 分组，之后每次调用从缓存的中间状态继续"""
     block_size = 64
-    if len(key) > block_size:
-        key = sm3_hash(key)
-    key = key.ljust(block_size, b'\x00')
-    o_key = bytes((k ^ 0x5c) for k in key)
-    i_key = bytes((k ^ 0x36) for k in key)
-    return sm3_hash(o_key + sm3_hash(i_key + data))
+
+    def __init__(self, key: bytes):
+        if len(key) > self.block_size:
+            key = sm3_hash(key)
+        key = key.ljust(self.block_size, b'\x00')
+        self._inner = SM3(bytes((k ^ 0x36) for k in key))
+        self._outer = SM3(bytes((k ^ 0x5c) for k in key))
+
+    def digest(self, data: bytes) -> bytes:
+        inner = self._inner.copy()
+        inner.update(data)
+        outer = self._outer.copy()
+        outer.update(inner.digest())
+        return outer.digest()
+
+    __call__ = digest
+
+
+def hmac_sm3(key: bytes, data: bytes) -> bytes:
+    return HmacSM3(key).digest(data)
 
 def kdf(z: bytes, klen: int) -> bytes:
-    # klen in bytes
-    ct = 1
-    res = b''
-    for i in range(math.ceil(klen / 32)):
-        res += sm3_hash(z + ct.to_bytes(4, 'big'))
-        ct += 1
-    return res[:klen]
+    # klen in bytes; z 的前缀状态只吸收一次，每个计数器从中间状态继续
+    prefix = SM3(z)
+    out = []
+    for ct in range(1, math.ceil(klen / 32) + 1):
+        h = prefix.copy()
+        h.update(ct.to_bytes(4, 'big'))
+        out.append(h.digest())
+    return b''.join(out)[:klen]
 
 
-def za_compute(IDA: bytes, PA: Tuple[int,int]) -> bytes:
+def za_message(IDA: bytes, PA: Tuple[int,int]) -> bytes:
     ENTLA = len(IDA) * 8
     a_b = a.to_bytes(32,'big')
     b_b = b.to_bytes(32,'big')
     xG_b = Gx.to_bytes(32,'big'); yG_b = Gy.to_bytes(32,'big')
     xA_b = PA[0].to_bytes(32,'big'); yA_b = PA[1].to_bytes(32,'big')
-    msg = ENTLA.to_bytes(2,'big') + IDA + a_b + b_b + xG_b + yG_b + xA_b + yA_b
-    return sm3_hash(msg)
+    return ENTLA.to_bytes(2,'big') + IDA + a_b + b_b + xG_b + yG_b + xA_b + yA_b
+
+
+def za_compute(IDA: bytes, PA: Tuple[int,int]) -> bytes:
+    return sm3_hash(za_message(IDA, PA))
 
 
 def deterministic_k(pri: int, h1: bytes, extra: bytes = b'') -> int:
     # key: bytes of x (private) and optionally extra data
     x = pri.to_bytes(32, 'big')
     V = b'\x01' * 32
-    K = b'\x00' * 32
-    K = hmac_sm3(K, V + b'\x00' + x + h1 + extra)
-    V = hmac_sm3(K, V)
-    K = hmac_sm3(K, V + b'\x01' + x + h1 + extra)
-    V = hmac_sm3(K, V)
+    mac = HmacSM3(b'\x00' * 32)
+    mac = HmacSM3(mac(V + b'\x00' + x + h1 + extra))
+    V = mac(V)
+    mac = HmacSM3(mac(V + b'\x01' + x + h1 + extra))
+    V = mac(V)
     while True:
         T = b''
         while len(T) < 32:
-            V = hmac_sm3(K, V)
+            V = mac(V)
             T += V
         k = int.from_bytes(T[:32], 'big')
         k = (k % (n-1)) + 1
         if 1 <= k <= n-1:
             return k
-        K = hmac_sm3(K, V + b'\x00')
-        V = hmac_sm3(K, V)
+        mac = HmacSM3(mac(V + b'\x00'))
+        V = mac(V)
 
 
 def sm2_keygen() -> Tuple[int, Tuple[int,int]]:
@@ -170,49 +137,183 @@ def sm2_keygen() -> Tuple[int, Tuple[int,int]]:
     P = scalar_mul(d, (Gx, Gy))
     return d, P
 
-def sm2_sign(d: int, IDA: bytes, M: bytes, k_func: Optional[Callable]=None) -> Tuple[int,int]:
-    # k_func: function(e_bytes, d) -> k int; if None, use random k
-    ZA = za_compute(IDA, scalar_mul(d, (Gx,Gy)))
-    M_ = ZA + M
-    e = sm3_int(M_) % n
-    if k_func is None:
-        k = secrets.randbelow(n-1) + 1
-    else:
-        # let k func accept (d, e_bytes)
-        k = k_func(d, e.to_bytes(32,'big'))
-    while True:
-        kG = scalar_mul(k, (Gx, Gy))
-        if kG is None:
-            k = secrets.randbelow(n-1) + 1
-            continue
-        x1,_ = kG
+def sm2_keygen_batch(count: int) -> list:
+    """批量生成 count 个密钥对：dG 查固定基点表，所有公钥一起转仿射，只求一次逆"""
+    table = ecc.fixed_base_table((Gx, Gy), a, q, n.bit_length())
+    ds = [secrets.randbelow(n-1) + 1 for _ in range(count)]
+    return list(zip(ds, ecc.batch_to_affine([table.mul(d) for d in ds], q)))
+
+class SM2Signer:
+    """签名方密钥上下文：缓存公钥、ZA 与 (1+d)^-1，每次签名只剩 e 的哈希、一次 kG 和几次模乘"""
+
+    def __init__(self, d: int, IDA: bytes, public_key: Optional[Tuple[int,int]] = None):
+        # public_key 可由批量密钥生成直接传入，省去一次 dG
+        self.d = d
+        self.IDA = IDA
+        self.public_key = scalar_mul(d, (Gx, Gy)) if public_key is None else public_key
+        self.za = za_compute(IDA, self.public_key)
+        self.inv_1_d = inv_mod((1 + d) % n, n)
+
+    def digest(self, M: bytes) -> int:
+        return sm3_int(self.za + M) % n
+
+    def sign_with_nonce(self, e: int, k: int, x1: int) -> Optional[Tuple[int,int]]:
+        """用预先算好的随机数对 (k, x1 = (kG).x) 对摘要 e 签名，只需几次模乘；
+        该随机数对此消息不可用时返回 None，调用方换一个 k 重试"""
         r = (e + x1) % n
         if r == 0 or (r + k) % n == 0:
-            k = secrets.randbelow(n-1) + 1
-            continue
-        inv = inv_mod((1 + d) % n, n)
-        s = (inv * (k - r * d)) % n
+            return None
+        s = (self.inv_1_d * (k - r * self.d)) % n
         if s == 0:
-            k = secrets.randbelow(n-1) + 1
-            continue
+            return None
         return (r, s)
 
+    def sign(self, M: bytes, k_func: Optional[Callable]=None) -> Tuple[int,int]:
+        # k_func: function(d, e_bytes) -> k int; if None, use random k
+        e = self.digest(M)
+        if k_func is None:
+            k = secrets.randbelow(n-1) + 1
+        else:
+            k = k_func(self.d, e.to_bytes(32,'big'))
+        while True:
+            kG = scalar_mul(k, (Gx, Gy))
+            signature = None if kG is None else self.sign_with_nonce(e, k, kG[0])
+            if signature is not None:
+                return signature
+            k = secrets.randbelow(n-1) + 1
+
+
+class SM2Verifier:
+    """验签方公钥上下文：缓存 ZA 与 PA 的 wNAF 奇数倍表，同一签名者的后续验签不再重建"""
+
+    def __init__(self, PA: Tuple[int,int], IDA: bytes):
+        self.public_key = PA
+        self.IDA = IDA
+        self.za = za_compute(IDA, PA)
+        self.table = ecc.odd_multiples(PA, a, q, PA_WNAF_WINDOW)
+
+    def _point(self, r: int, s: int):
+        """返回 sG + tPA 的 Jacobian 坐标；签名格式不合法时返回 None"""
+        if not (1 <= r <= n-1 and 1 <= s <= n-1):
+            return None
+        t = (r + s) % n
+        if t == 0:
+            return None
+        # sG + tPA 共用一条倍点链 (Shamir's trick)，G 使用缓存的宽窗口表
+        return ecc.double_scalar_mul(
+            s, (Gx, Gy), t, self.public_key, a, q, w1=G_WNAF_WINDOW, w2=PA_WNAF_WINDOW,
+            table1=ecc.cached_odd_multiples((Gx, Gy), a, q, G_WNAF_WINDOW), table2=self.table)
+
+    def verify(self, M: bytes, signature: Tuple[int,int]) -> bool:
+        r, s = signature
+        x1y1 = ecc.to_affine(self._point(r, s), q)
+        if x1y1 is None:
+            return False
+        e = sm3_int(self.za + M) % n
+        return (e + x1y1[0]) % n == r
+
+
+class VerifierCache:
+    """按 (PA, IDA) 索引的有界 LRU 缓存，适合反复验证同一批热点签名者。
+    内部加锁，可被多个线程共享；新上下文在锁外构建，不阻塞其他线程的命中"""
+
+    def __init__(self, maxsize: int = 256):
+        if maxsize < 1:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, PA: Tuple[int,int], IDA: bytes) -> SM2Verifier:
+        key = (PA, IDA)
+        with self._lock:
+            ctx = self._entries.get(key)
+            if ctx is not None:
+                self._entries.move_to_end(key)
+                return ctx
+        ctx = SM2Verifier(PA, IDA)
+        with self._lock:
+            # 构建期间其他线程可能已插入同一公钥，保留先到的那个
+            ctx = self._entries.setdefault(key, ctx)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return ctx
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+verifier_cache = VerifierCache()
+
+
+def sm2_sign(d: int, IDA: bytes, M: bytes, k_func: Optional[Callable]=None) -> Tuple[int,int]:
+    # 一次性签名；同一私钥反复签名时应持有 SM2Signer，免去每次的 dG 与 ZA
+    return SM2Signer(d, IDA).sign(M, k_func)
+
 def sm2_verify(PA: Tuple[int,int], IDA: bytes, M: bytes, signature: Tuple[int,int]) -> bool:
-    r, s = signature
-    if not (1 <= r <= n-1 and 1 <= s <= n-1):
-        return False
-    ZA = za_compute(IDA, PA)
-    M_ = ZA + M
-    e = sm3_int(M_) % n
-    t = (r + s) % n
-    if t == 0:
-        return False
-    x1y1 = point_add(scalar_mul(s, (Gx,Gy)), scalar_mul(t, PA))
-    if x1y1 is None:
-        return False
-    x1,_ = x1y1
-    R = (e + x1) % n
-    return R == r
+    return verifier_cache.get(PA, IDA).verify(M, signature)
+
+def _verify_chunk(items) -> list:
+    """一批 (PA, IDA, M, signature) 的验签：ZA 与 PA 的奇数倍表取自 verifier_cache，
+    ZA || M 的摘要批量计算，所有 sG + tPA 最后一起做一次联合求逆转仿射坐标"""
+    contexts = [verifier_cache.get(PA, IDA) for PA, IDA, _, _ in items]
+    digests = sm3_many([ctx.za + M for ctx, (_, _, M, _) in zip(contexts, items)])
+
+    results = [False] * len(items)
+    pending = []  # (下标, r, e)
+    points = []
+    for i, (ctx, (_, _, _, (r, s)), digest) in enumerate(zip(contexts, items, digests)):
+        point = ctx._point(r, s)
+        if point is None:
+            continue
+        points.append(point)
+        pending.append((i, r, int.from_bytes(digest, 'big') % n))
+    for (i, r, e), x1y1 in zip(pending, ecc.batch_to_affine(points, q)):
+        results[i] = x1y1 is not None and (e + x1y1[0]) % n == r
+    return results
+
+
+def _chunks(items: list, chunk_size: int) -> list:
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def sm2_verify_batch(items, workers: Optional[int] = None, chunk_size: int = 256) -> list:
+    """批量验签，items 为 (PA, IDA, M, signature) 序列，返回与输入顺序一致的 bool 列表。
+
+    按 chunk_size 分块，多块时分发到 ProcessPoolExecutor (workers 默认为 CPU 核数)，
+    workers=1 或只有一块时在本进程内计算。
+    """
+    chunks = _chunks(list(items), chunk_size)
+    if workers == 1 or len(chunks) <= 1:
+        return [ok for chunk in chunks for ok in _verify_chunk(chunk)]
+    out = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for results in pool.map(_verify_chunk, chunks):
+            out.extend(results)
+    return out
+
+
+def sm2_verify_all(items, workers: Optional[int] = None, chunk_size: int = 256) -> bool:
+    """全部签名有效时返回 True；遇到第一个无效块即返回 False 并取消尚未开始的块。
+
+    SM2 签名只携带 x1，无法像 Schnorr 那样把整批合并成一个随机线性组合检查，
+    因此这里的快速路径是提前退出，而非减少点运算。
+    """
+    chunks = _chunks(list(items), chunk_size)
+    if workers == 1 or len(chunks) <= 1:
+        return all(all(_verify_chunk(chunk)) for chunk in chunks)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        return all(all(results) for results in pool.map(_verify_chunk, chunks))
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
 
 
 if __name__ == "__main__":
@@ -2,6 +2,8 @@ import hashlib
 import secrets
 from typing import Tuple, Optional
 
+import ecc
+
 
 P = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFF
 A = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFC
@@ -45,14 +47,15 @@ class SM2:
         return (x3, y3)
     
     def _mul_point(self, k: int, P: Tuple[int, int]) -> Tuple[int, int]:
-        """椭圆曲线点乘 (标量乘法)"""
-        R = (0, 0)
-        while k:
-            if k & 1:
-                R = self._add_points(R, P)
-            P = self._add_points(P, P)
-            k >>= 1
-        return R
+        """椭圆曲线点乘 (标量乘法)，内部使用 Jacobian 坐标，仅最后求一次逆"""
+        if P == (0, 0):
+            return (0, 0)
+        if P == self.g:
+            R = ecc.fixed_base_table(P, self.a, self.p, self.n.bit_length()).mul(k % self.n)
+            R = ecc.to_affine(R, self.p)
+        else:
+            R = ecc.scalar_mul(k, P, self.a, self.p)
+        return (0, 0) if R is None else R
     
     def _hash(self, data: bytes) -> int:
         """哈希函数 (可被重写用于伪造)"""
@@ -89,9 +92,10 @@ class SM2:
         if t == 0:
             return False
       
-        point1 = self._mul_point(s, self.g)
-        point2 = self._mul_point(t, P)
-        x1, y1 = self._add_points(point1, point2)
+        # sG + tP 共用一条倍点链 (Shamir's trick)
+        table_g = ecc.cached_odd_multiples(self.g, self.a, self.p, 7)
+        point = ecc.double_scalar_mul(s, self.g, t, P, self.a, self.p, w1=7, table1=table_g)
+        x1, y1 = ecc.to_affine(point, self.p) or (0, 0)
         R = (e + x1) % self.n
         return R == r
     
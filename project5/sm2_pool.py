@@ -0,0 +1,168 @@
+"""SM2 签名池：后台进程预先生成随机数对 (k, x1 = (kG).x)，在线签名只剩一次 SM3 摘要和几次模乘"""
+import itertools
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import ecc
+from sm2 import SM2Signer, SM2Verifier, sm2_keygen_batch, Gx, Gy, a, q, n
+
+
+def generate_nonces(count: int) -> list:
+    """生成 count 个 (k, x1)：kG 查固定基点表，整批只求一次逆 (在工作进程中运行)"""
+    table = ecc.fixed_base_table((Gx, Gy), a, q, n.bit_length())
+    ks = [secrets.randbelow(n-1) + 1 for _ in range(count)]
+    points = ecc.batch_to_affine([table.mul(k) for k in ks], q)
+    return [(k, P[0]) for k, P in zip(ks, points) if P is not None]
+
+
+class SM2SigningPool:
+    """按 key_id 管理签名密钥，并维护一个预生成随机数对的池。
+
+    池中数量低于 low_water 时向后台进程提交补充任务，补到 size 为止；
+    池被取空时在本进程内同步生成一个随机数对，签名不会因此阻塞在后台任务上。
+    每个随机数对只会被取出一次，绝不复用。
+    """
+
+    def __init__(self, size: int = 4096, low_water: int = None, batch_size: int = 256,
+                 workers: int = None):
+        if size < 1 or batch_size < 1:
+            raise ValueError("size and batch_size must be positive")
+        self.size = size
+        self.low_water = size // 4 if low_water is None else low_water
+        self.batch_size = batch_size
+        self.signers = {}
+        self._nonces = deque()
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._pending_count = 0
+        self._ids = itertools.count()
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self.stats = {'online': 0, 'fallback': 0}
+        self._refill()
+
+    def add_key(self, key_id, d: int, IDA: bytes, public_key=None) -> tuple:
+        """注册私钥，返回公钥"""
+        signer = SM2Signer(d, IDA, public_key)
+        self.signers[key_id] = signer
+        return signer.public_key
+
+    def generate_keys(self, count: int, IDA: bytes) -> list:
+        """批量生成并注册 count 个密钥，返回 [(key_id, 公钥)]；key_id 为递增整数"""
+        out = []
+        for d, P in sm2_keygen_batch(count):
+            key_id = next(self._ids)
+            while key_id in self.signers:
+                key_id = next(self._ids)
+            out.append((key_id, self.add_key(key_id, d, IDA, P)))
+        return out
+
+    def available(self) -> int:
+        return len(self._nonces)
+
+    def _refill(self, force: bool = False) -> None:
+        """池 (含在途任务) 低于 low_water 时补到 size；force 时无论水位都补满。
+        回调在释放锁之后才注册：任务若已完成，add_done_callback 会在当前线程立即调用 _on_nonces"""
+        submitted = []
+        broken = None
+        with self._lock:
+            if self._executor is None:
+                return
+            if not force and len(self._nonces) + self._pending_count >= self.low_water:
+                return
+            try:
+                while len(self._nonces) + self._pending_count < self.size:
+                    future = self._executor.submit(generate_nonces, self.batch_size)
+                    self._pending.add(future)
+                    self._pending_count += self.batch_size
+                    submitted.append(future)
+            except BrokenProcessPool:
+                # 后台进程不可用时不再补充，_take_nonce 退回本进程内同步生成
+                broken, self._executor = self._executor, None
+        for future in submitted:
+            future.add_done_callback(self._on_nonces)
+        if broken is not None:
+            broken.shutdown(wait=False, cancel_futures=True)
+
+    def _on_nonces(self, future) -> None:
+        nonces = [] if future.cancelled() or future.exception() else future.result()
+        with self._lock:
+            self._pending.discard(future)
+            self._pending_count -= self.batch_size
+            self._nonces.extend(nonces)
+
+    def _take_nonce(self) -> tuple:
+        try:
+            nonce = self._nonces.popleft()
+            self.stats['online'] += 1
+        except IndexError:
+            nonce = generate_nonces(1)[0]
+            self.stats['fallback'] += 1
+        if len(self._nonces) < self.low_water:
+            self._refill()
+        return nonce
+
+    def wait(self, timeout: float = None) -> bool:
+        """把池补到 size 并等待补充任务完成，返回池是否已满"""
+        self._refill(force=True)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                pending = list(self._pending)
+            if not pending:
+                return len(self._nonces) >= self.size
+            for future in pending:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    future.result(remaining)
+                except Exception:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        return False
+
+    def sign(self, key_id, message: bytes) -> tuple:
+        signer = self.signers[key_id]
+        e = signer.digest(message)
+        while True:
+            k, x1 = self._take_nonce()
+            signature = signer.sign_with_nonce(e, k, x1)
+            if signature is not None:
+                return signature
+
+    def sign_many(self, requests) -> list:
+        """按顺序处理 (key_id, message) 请求队列，返回签名列表"""
+        return [self.sign(key_id, message) for key_id, message in requests]
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    IDA = b'ALICE123@YAHOO.COM'
+    with SM2SigningPool(size=2048, batch_size=256) as pool:
+        keys = pool.generate_keys(8, IDA)
+        pool.wait()
+        print(f"预生成随机数对: {pool.available()}")
+
+        requests = [(keys[i % len(keys)][0], b'message %d' % i) for i in range(1000)]
+        t0 = time.perf_counter()
+        signatures = pool.sign_many(requests)
+        elapsed = time.perf_counter() - t0
+        print(f"签名 {len(requests)} 条: 平均 {elapsed / len(requests) * 1e6:.1f} us/条, "
+              f"池命中 {pool.stats['online']}, 同步生成 {pool.stats['fallback']}")
+
+        public_keys = dict(keys)
+        ok = all(SM2Verifier(public_keys[key_id], IDA).verify(message, sig)
+                 for (key_id, message), sig in zip(requests[:50], signatures[:50]))
+        print(f"抽样验签: {'成功' if ok else '失败'}")